@@ -17,6 +17,9 @@ from subprocess import CalledProcessError
 from typing import Union
 from urllib.error import HTTPError, URLError
 
+from decompiler.errors import ArtifactError
+from decompiler.extract import extract_all, extract_member
+
 assert sys.version_info >= (3, 7)
 
 CFR_VERSION = "0.152"
@@ -200,40 +203,23 @@ def get_version_jar(target_version, side, quiet):
                             except Exception as _:
                                 # we don't have a versions.list in it
                                 pass
-                            if content is not None:
-                                element = content.split(b"\t")
-                                if len(element) != 3:
-                                    logging.info(
-                                        f"Jar should be extracted but version list is not in the correct format, expected 3 fields, got {len(element)} for {content}")
-                                    raise SystemExit(1)
-                                version_hash = element[0].decode()
-                                version = element[1].decode()
-                                path = element[2].decode()
-                                if version != target_version and not quiet:
-                                    logging.info(
-                                        f"Warning, version is not identical to the one targeted got {version} exepected {target_version}")
-                                new_jar_path = f"./versions/{target_version}"
-                                try:
-                                    new_jar_path = z.extract(f"META-INF/versions/{path}", new_jar_path)
-                                except Exception as e:
-                                    logging.error(f"Could not extract to {new_jar_path} with error {e}")
-                                    raise SystemExit(1)
-                                if Path(new_jar_path).exists():
-                                    file_hash = sha256(new_jar_path)
-                                    if file_hash != version_hash:
-                                        logging.info(
-                                            f"Extracted file hash and expected hash did not match up, got {file_hash} expected {version_hash}")
-                                        raise SystemExit(1)
-                                    try:
-                                        shutil.move(new_jar_path, jar_path)
-                                        shutil.rmtree(f"./versions/{target_version}/META-INF")
-                                    except Exception as e:
-                                        logging.info("Exception while removing the temp file", e)
-                                        raise SystemExit(1)
-                                else:
-                                    logging.info(
-                                        f"New {side} jar could not be extracted from archive at {new_jar_path}, failure")
-                                    raise SystemExit(1)
+                        if content is not None:
+                            element = content.split(b"\t")
+                            if len(element) != 3:
+                                logging.info(
+                                    f"Jar should be extracted but version list is not in the correct format, expected 3 fields, got {len(element)} for {content}")
+                                raise SystemExit(1)
+                            version_hash = element[0].decode()
+                            version = element[1].decode()
+                            path = element[2].decode()
+                            if version != target_version and not quiet:
+                                logging.info(
+                                    f"Warning, version is not identical to the one targeted got {version} exepected {target_version}")
+                            try:
+                                extract_member(jar_path, f"META-INF/versions/{path}", jar_path, version_hash)
+                            except ArtifactError as e:
+                                logging.info(f"New {side} jar could not be extracted from archive, failure: {e}")
+                                raise SystemExit(1)
                     else:
                         logging.info(f"Jar was maybe downloaded but not located, this is a failure, check path at {jar_path}")
                         raise SystemExit(1)
@@ -355,8 +341,8 @@ def decompile_fern_flower(decompiled_version, version, side, quiet, force):
         os.remove(f'{SRC_DIR}/{version}-{side}-temp.jar')
         if not quiet:
             logging.info("Decompressing remapped jar to directory")
-        with zipfile.ZipFile(f'{SRC_DIR}/{decompiled_version}/{side}/{version}-{side}-temp.jar') as z:
-            z.extractall(path=f'{SRC_DIR}/{decompiled_version}/{side}')
+        extract_all(f'{SRC_DIR}/{decompiled_version}/{side}/{version}-{side}-temp.jar',
+                    f'{SRC_DIR}/{decompiled_version}/{side}')
         t = time.time() - t
         if not quiet:
             logging.info(f'Done in %.1fs (file was decompressed in {decompiled_version}/{side})' % t)
@@ -364,9 +350,9 @@ def decompile_fern_flower(decompiled_version, version, side, quiet, force):
             response = input() or "y"
             if response == 'y':
                 logging.info(f'- Removing -> {decompiled_version}/{side}/{version}-{side}-temp.jar')
-                os.remove(f'{SRC_DIR}/{decompiled_version}/{side}/{version}-{side}-temp.jar')
+                Path(f'{SRC_DIR}/{decompiled_version}/{side}/{version}-{side}-temp.jar').unlink(missing_ok=True)
         if force:
-            os.remove(f'{SRC_DIR}/{decompiled_version}/{side}/{version}-{side}-temp.jar')
+            Path(f'{SRC_DIR}/{decompiled_version}/{side}/{version}-{side}-temp.jar').unlink(missing_ok=True)
 
     else:
         if not quiet:
@@ -421,7 +407,7 @@ def remap_file_path(path):
     return "L" + "/".join(path.split(".")) + ";" if path not in remap_primitives else remap_primitives[path]
 
 
-def convert_mappings(version, side, quiet):
+def convert_mappings(version, side, quiet, output=None):
     with open(f'./mappings/{version}/{side}.txt', 'r') as inputFile:
         file_name = {}
         for line in inputFile.readlines():
@@ -432,8 +418,8 @@ def convert_mappings(version, side, quiet):
                 obf_name = obf_name.split(":")[0]
                 file_name[remap_file_path(deobf_name)] = obf_name  # save it to compare to put the Lb
 
-    with open(f'./mappings/{version}/{side}.txt', 'r') as inputFile, open(f'./mappings/{version}/{side}.tsrg',
-                                                                        'w+') as outputFile:
+    output = output or f'./mappings/{version}/{side}.tsrg'
+    with open(f'./mappings/{version}/{side}.txt', 'r') as inputFile, open(output, 'w+') as outputFile:
         for line in inputFile.readlines():
             if line.startswith('#'):  # comment at the top, could be stripped
                 continue
@@ -559,8 +545,7 @@ def make_paths(version, side, removal_bool, force, forceno):
 def delete_dependencies(version, side):
     path = f'{TMP_DIR}/{version}/{side}'
 
-    with zipfile.ZipFile(f'{SRC_DIR}/{version}-{side}-temp.jar') as z:
-        z.extractall(path=path)
+    extract_all(f'{SRC_DIR}/{version}-{side}-temp.jar', path)
 
     for _dir in [join(path, "com"), path]:
         for f in os.listdir(_dir):
@@ -675,8 +660,7 @@ def download_n_decompile(minecraft_version: str,
         if not quiet:
             logging.info("===FINISHED DECOMPILING===")
             logging.info(f"output is in {SRC_DIR}/{decompiled_version}")
-            return str(Path(f"{SRC_DIR}/{decompiled_version}").absolute())
-        sys.exit(0)
+        return str(Path(f"{SRC_DIR}/{decompiled_version}").absolute())
 
     r = download_mapping
     if r:
@@ -708,4 +692,4 @@ def download_n_decompile(minecraft_version: str,
     if not quiet:
         logging.info("===FINISHED DECOMPILING===")
         logging.info(f"output is in {SRC_DIR}/{decompiled_version}")
-        return str(Path(f"{SRC_DIR}/{decompiled_version}").absolute())
+    return str(Path(f"{SRC_DIR}/{decompiled_version}").absolute())
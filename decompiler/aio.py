@@ -0,0 +1,448 @@
+"""Non-interactive asyncio API for the decompile pipeline.
+
+Nothing in here prompts on stdin or exits the interpreter, failures are raised as
+:class:`DecompilerError` subclasses and a finished run is described by a :class:`DecompileResult`.
+Concurrent :func:`decompile` calls for the same version, side, decompiler and preferences share one in-flight job,
+each decompiler and preference set writes to its own :func:`output_dir`.
+"""
+import asyncio
+import hashlib
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import time
+import urllib.request
+import weakref
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+
+from decompiler import (CFR_VERSION, MANIFEST_LOCATION, SERVER, SPECIAL_SOURCE_VERSION, SRC_DIR, Decompiler, Side,
+                        convert_mappings)
+from decompiler.errors import ArtifactError, DownloadError, JavaNotFoundError, ProcessError, VersionNotFoundError
+from decompiler.extract import extract_all, extract_member
+
+LIB_DIR = Path(__file__).resolve().parent.parent / "lib"
+# seconds a connect or a single read may block, a stalled download fails instead of holding its thread forever
+TIMEOUT = 60
+
+# written into every finished output directory, output is only reused when it matches the request
+MARKER = ".decompiler.json"
+
+NAMES = {Decompiler.CFR: "cfr", Decompiler.F: "fernflower"}
+
+SNAPSHOT_ALIASES = ("snap", "s", "snapshot")
+RELEASE_ALIASES = ("latest", "l")
+
+
+@dataclass(frozen=True)
+class DecompileResult:
+    version: str
+    side: Side
+    decompiler: Decompiler
+    path: Path
+    elapsed: float
+    cached: bool
+
+
+class _Job:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+_jobs: dict[tuple[str, Side, Decompiler, str], _Job] = {}
+_side_locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[str, Side], asyncio.Lock]] = \
+    weakref.WeakKeyDictionary()
+
+
+def _temp_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{random.getrandbits(32):08x}.part")
+
+
+def _download_to(url: str, filename: Path):
+    """Stream ``url`` into ``filename``, the file only appears once it is complete"""
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    partial = _temp_path(filename)
+    try:
+        with urllib.request.urlopen(url, timeout=TIMEOUT) as f, open(partial, "wb") as local_file:
+            shutil.copyfileobj(f, local_file, 1024 * 1024)
+        os.replace(partial, filename)
+    except (OSError, http.client.HTTPException) as e:
+        raise DownloadError(url, e) from e
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def _read_url(url: str) -> bytes:
+    try:
+        with urllib.request.urlopen(url, timeout=TIMEOUT) as f:
+            return f.read()
+    except (OSError, http.client.HTTPException) as e:
+        raise DownloadError(url, e) from e
+
+
+async def download(url: str, filename: Path):
+    await asyncio.to_thread(_download_to, url, Path(filename))
+
+
+async def get_manifest(manifest_url: str = MANIFEST_LOCATION) -> dict:
+    """Fetch the global version manifest, always fresh and never written to disk"""
+    data = await asyncio.to_thread(_read_url, manifest_url)
+    return parse_manifest(data, manifest_url)
+
+
+def parse_manifest(data: bytes, manifest_url: str) -> dict:
+    try:
+        manifest = json.loads(data)
+    except ValueError as e:
+        raise ArtifactError(f"Version manifest at {manifest_url} is not valid json: {e}") from e
+    if (not isinstance(manifest, dict) or not isinstance(manifest.get("versions", []), list)
+            or not isinstance(manifest.get("latest") or {}, dict)):
+        raise ArtifactError(f"Version manifest at {manifest_url} does not have the layout of a version manifest")
+    return manifest
+
+
+def resolve_alias(version: str, manifest: dict) -> str:
+    latest = manifest.get("latest") or {}
+    if version in SNAPSHOT_ALIASES:
+        version = latest.get("snapshot")
+    elif version in RELEASE_ALIASES:
+        version = latest.get("release")
+    if not version:
+        raise VersionNotFoundError("Version manifest does not list the latest versions")
+    return version
+
+
+async def resolve_version(version: str, manifest_url: str = MANIFEST_LOCATION) -> str:
+    """Turn 'snap' / 'latest' (and their short forms) into a concrete version id"""
+    if version not in SNAPSHOT_ALIASES + RELEASE_ALIASES:
+        return version
+    return resolve_alias(version, await get_manifest(manifest_url))
+
+
+async def run(*args: str):
+    """Run a subprocess to completion, killing it if the awaiting task is cancelled"""
+    proc = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.DEVNULL,
+                                                stderr=asyncio.subprocess.PIPE)
+    try:
+        _, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode != 0:
+        raise ProcessError(args, proc.returncode, stderr.decode(errors="replace"))
+
+
+async def find_java() -> str:
+    java = shutil.which("java")
+    if java is None:
+        raise JavaNotFoundError("Java JDK is not installed or not on the PATH")
+    try:
+        await run(java, "-version")
+    except (OSError, ProcessError) as e:
+        raise JavaNotFoundError(f"{java} -version failed: {e}") from e
+    return java
+
+
+def _unbundle_server_jar(jar_path: Path, target_version: str):
+    """Servers newer than 21w39a ship the real jar inside META-INF/versions, swap it in place"""
+    try:
+        with zipfile.ZipFile(jar_path) as z:
+            try:
+                content = z.read("META-INF/versions.list")
+            except KeyError:
+                return
+        element = content.strip().split(b"\t")
+        if len(element) != 3:
+            raise ArtifactError(f"Version list in {jar_path} has {len(element)} fields, expected 3: {content}")
+        version_hash, version, path = (e.decode() for e in element)
+        if version != target_version:
+            logging.warning(f"Bundled server version is {version}, expected {target_version}")
+        extract_member(jar_path, f"META-INF/versions/{path}", jar_path, version_hash)
+    except (zipfile.BadZipFile, UnicodeDecodeError) as e:
+        raise ArtifactError(f"{jar_path} is not a valid jar: {e}") from e
+
+
+async def _fetch_version_json(url: str, version_json: Path) -> dict:
+    """Download and parse version.json, a file that does not parse is never left in place"""
+    partial = _temp_path(version_json)
+    try:
+        await download(url, partial)
+        try:
+            data = json.loads(partial.read_text())
+            if not isinstance(data, dict):
+                raise ValueError("expected a json object")
+        except ValueError as e:
+            raise ArtifactError(f"{url} is not a valid version json: {e}") from e
+        os.replace(partial, version_json)
+    finally:
+        partial.unlink(missing_ok=True)
+    return data
+
+
+def _convert_mappings(version: str, side: str, tsrg: Path):
+    partial = _temp_path(tsrg)
+    try:
+        try:
+            convert_mappings(version, side, True, output=partial)
+        except (ValueError, KeyError, IndexError) as e:
+            raise ArtifactError(f"Mappings of {version} {side} could not be converted: {e}") from e
+        os.replace(partial, tsrg)
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def _install_jar(partial: Path, jar: Path, version: str, side: Side):
+    """Validate (and for servers unbundle) a freshly downloaded jar, then move it to its final path"""
+    if not zipfile.is_zipfile(partial):
+        raise ArtifactError(f"Downloaded {side.value} jar of {version} is not a valid jar")
+    if side.value == SERVER:
+        _unbundle_server_jar(partial, version)
+    os.replace(partial, jar)
+
+
+def _extract_sources(jar_path: Path, out: Path):
+    extract_all(jar_path, out)
+    jar_path.unlink()
+
+
+async def prepare(version: str, side: Side, manifest_url: str = MANIFEST_LOCATION) -> tuple[str, Path, Path]:
+    """Download the jar and mappings of ``version`` if needed, returns the java executable, jar and tsrg mappings"""
+    side = Side(side)
+    java = await find_java()
+    manifest = await get_manifest(manifest_url)
+    entry = next((v for v in manifest.get("versions", []) if v.get("id") == version and v.get("url")), None)
+    if entry is None:
+        raise VersionNotFoundError(f"Version {version} is not in the version manifest")
+
+    version_dir = Path(f"./versions/{version}")
+    mappings_dir = Path(f"./mappings/{version}")
+    version_json = version_dir / "version.json"
+    if version_json.is_file():
+        try:
+            data = json.loads(version_json.read_text())
+        except ValueError as e:
+            raise ArtifactError(f"{version_json} is not valid json, delete it to download it again: {e}") from e
+    else:
+        data = await _fetch_version_json(entry["url"], version_json)
+    downloads = data.get("downloads") or {}
+
+    mappings = mappings_dir / f"{side.value}.txt"
+    if not mappings.is_file():
+        url = downloads.get(f"{side.value}_mappings", {}).get("url")
+        if not url:
+            raise ArtifactError(f"Missing {side.value} mappings for {version}")
+        await download(url, mappings)
+    tsrg = mappings_dir / f"{side.value}.tsrg"
+    if not tsrg.is_file():
+        await asyncio.to_thread(_convert_mappings, version, side.value, tsrg)
+
+    jar = version_dir / f"{side.value}.jar"
+    if not jar.is_file():
+        url = downloads.get(side.value, {}).get("url")
+        if not url:
+            raise ArtifactError(f"Missing {side.value} jar for {version}")
+        # only a complete, unbundled jar ever reaches the final path, anything else would be cached forever
+        partial = _temp_path(jar)
+        try:
+            await download(url, partial)
+            await asyncio.to_thread(_install_jar, partial, jar, version, side)
+        finally:
+            partial.unlink(missing_ok=True)
+    return java, jar.resolve(), tsrg.resolve()
+
+
+async def remap(java: str, jar: Path, tsrg: Path, out_jar: Path):
+    await run(java,
+              "-jar", str(LIB_DIR / f"SpecialSource-{SPECIAL_SOURCE_VERSION}.jar"),
+              "--in-jar", str(jar),
+              "--out-jar", str(out_jar),
+              "--srg-in", str(tsrg),
+              "--kill-lvt")
+
+
+async def run_decompiler(java: str, decompiler_type: Decompiler, jar: Path, out: Path, library: Path = None):
+    """Decompile ``jar`` into the existing directory ``out``, ``library`` is put on the classpath when given"""
+    if decompiler_type == Decompiler.CFR:
+        extra = ["--extraclasspath", str(library)] if library else []
+        await run(java, "-Xmx4G", "-Xms1G",
+                  "-jar", str(LIB_DIR / f"cfr-{CFR_VERSION}.jar"),
+                  str(jar),
+                  "--outputdir", str(out),
+                  "--caseinsensitivefs", "true",
+                  "--silent", "true",
+                  *extra)
+        (out / "summary.txt").unlink(missing_ok=True)
+    else:
+        extra = [f"-e={library}"] if library else []
+        await run(java, "-Xmx4G", "-Xms1G",
+                  "-jar", str(LIB_DIR / "fernflower.jar"),
+                  "-hes=0", "-hdc=0", "-dgs=1", "-lit=1", "-asc=1", "-log=WARN",
+                  *extra,
+                  str(jar), str(out))
+        await asyncio.to_thread(_extract_sources, out / jar.name, out)
+
+
+def top_level_class(entry: str):
+    """``net/minecraft/Foo$Bar.class`` -> ``net.minecraft.Foo``, None for anything but classes"""
+    if not entry.endswith(".class"):
+        return None
+    return entry[:-len(".class")].split("$", 1)[0].replace("/", ".")
+
+
+def _filter_jar(jar: Path, out_jar: Path, classes: set[str]) -> int:
+    count = 0
+    with zipfile.ZipFile(jar) as z, zipfile.ZipFile(out_jar, "w", zipfile.ZIP_DEFLATED) as out:
+        for info in z.infolist():
+            if top_level_class(info.filename) in classes:
+                out.writestr(info, z.read(info))
+                count += 1
+    return count
+
+
+async def _route_preferred(java: str, decompiler_type: Decompiler, preferences: dict, remapped: Path, out: Path):
+    """Re-decompile the classes that prefer another decompiler and overwrite their sources in ``out``"""
+    routed = {}
+    for name, preferred in preferences.items():
+        if Decompiler(preferred) != decompiler_type:
+            routed.setdefault(Decompiler(preferred), set()).add(name)
+    for other, classes in routed.items():
+        subset = remapped.with_name(f"{remapped.stem}-{other.value}.jar")
+        routed_out = out.with_name(f"{out.name}-{other.value}")
+        shutil.rmtree(routed_out, ignore_errors=True)
+        routed_out.mkdir(parents=True)
+        try:
+            if not await asyncio.to_thread(_filter_jar, remapped, subset, classes):
+                continue
+            await run_decompiler(java, other, subset, routed_out, library=remapped)
+            for name in classes:
+                source = routed_out.joinpath(*name.split(".")).with_suffix(".java")
+                if source.is_file():
+                    target = out / source.relative_to(routed_out)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(source, target)
+            logging.info(f"Routed {len(classes)} classes to {other.name}")
+        finally:
+            subset.unlink(missing_ok=True)
+            shutil.rmtree(routed_out, ignore_errors=True)
+
+
+def _preferences_hash(preferences: dict = None) -> str:
+    routed = sorted((name, Decompiler(d).value) for name, d in (preferences or {}).items())
+    return hashlib.sha256(json.dumps(routed).encode()).hexdigest()
+
+
+def output_dir(version: str, side: Side, decompiler_type: Decompiler, preferences: dict = None) -> Path:
+    """
+    Where :func:`decompile` writes ``version``: ``src/<version>/<side>-<decompiler>``.
+
+    Output routed by ``preferences`` gets the first characters of their hash appended, so every decompiler and
+    preference set has a directory of its own and concurrent jobs never write into each other's output.
+    """
+    name = f"{Side(side).value}-{NAMES[Decompiler(decompiler_type)]}"
+    if preferences:
+        name += f"-{_preferences_hash(preferences)[:8]}"
+    return Path(SRC_DIR) / version / name
+
+
+def _is_cached(out: Path, marker: dict) -> bool:
+    try:
+        return json.loads((out / MARKER).read_text()) == marker
+    except (OSError, ValueError):
+        return False
+
+
+async def _decompile(version: str, side: Side, decompiler_type: Decompiler, manifest_url: str,
+                     preferences: dict, out: Path, marker: dict):
+    java, jar, tsrg = await prepare(version, side, manifest_url)
+    staging = out.with_name(f".{out.name}-partial")
+    remapped = Path(f"{SRC_DIR}/{version}-{side.value}-temp.jar")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        await remap(java, jar, tsrg, remapped)
+        await run_decompiler(java, decompiler_type, remapped, staging)
+        if preferences:
+            await _route_preferred(java, decompiler_type, preferences, remapped, staging)
+        (staging / MARKER).write_text(json.dumps(marker))
+        shutil.rmtree(out, ignore_errors=True)
+        os.replace(staging, out)
+    finally:
+        remapped.unlink(missing_ok=True)
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _side_lock(version: str, side: Side) -> asyncio.Lock:
+    # asyncio locks belong to the loop they were first contended in, keep one set per running loop
+    locks = _side_locks.setdefault(asyncio.get_running_loop(), {})
+    return locks.setdefault((version, side), asyncio.Lock())
+
+
+async def _run_job(version: str, side: Side, decompiler_type: Decompiler, force: bool, manifest_url: str,
+                   preferences: dict) -> DecompileResult:
+    out = output_dir(version, side, decompiler_type, preferences)
+    marker = {"decompiler": decompiler_type.value, "preferences": _preferences_hash(preferences)}
+    # the cache check happens under the lock, a job rebuilding this output can not be running at the same time
+    async with _side_lock(version, side):
+        if not force and _is_cached(out, marker):
+            return DecompileResult(version, side, decompiler_type, out.absolute(), 0.0, True)
+        t = time.monotonic()
+        await _decompile(version, side, decompiler_type, manifest_url, preferences, out, marker)
+        return DecompileResult(version, side, decompiler_type, out.absolute(), time.monotonic() - t, False)
+
+
+async def decompile(version: str,
+                    side: Side = Side.SERVER,
+                    decompiler_type: Decompiler = Decompiler.CFR,
+                    force: bool = False,
+                    manifest_url: str = MANIFEST_LOCATION,
+                    preferences: dict[str, Decompiler] = None) -> DecompileResult:
+    """
+    :param version:
+        A version id, or 'snap' / 'latest' for the newest snapshot / release
+    :param side:
+        The side you want to decompile (either client or server)
+    :param decompiler_type:
+        Choose between fernflower and cfr.
+    :param force:
+        Decompile again even if :func:`output_dir` already holds finished output, output without a matching
+        ``.decompiler.json`` marker is always rebuilt
+    :param manifest_url:
+        Where to fetch the version manifest from
+    :param preferences:
+        Top level class name -> decompiler, classes preferring another decompiler than ``decompiler_type``
+        are decompiled by it instead (see :mod:`decompiler.compare`)
+
+    :return:
+        A :class:`DecompileResult`, ``cached`` is set when existing output was reused
+
+    Calls made while a job for the same version, side, decompiler and preferences is running share its result.
+    Cancelling the call only cancels the underlying job when no other caller is waiting on it, and then only
+    returns once the job stopped and cleaned up.
+    """
+    version = await resolve_version(version, manifest_url)
+    side = Side(side)
+    decompiler_type = Decompiler(decompiler_type)
+    key = (version, side, decompiler_type, _preferences_hash(preferences))
+    job = _jobs.get(key)
+    if job is None:
+        job = _Job(asyncio.create_task(_run_job(version, side, decompiler_type, force, manifest_url, preferences)))
+        _jobs[key] = job
+        job.task.add_done_callback(lambda _: _jobs.pop(key, None) if _jobs.get(key) is job else None)
+    job.waiters += 1
+    try:
+        return await asyncio.shield(job.task)
+    except asyncio.CancelledError:
+        if job.waiters == 1 and not job.task.done():
+            job.task.cancel()
+            # let the job kill java and remove its staging directory before the cancellation goes on
+            await asyncio.wait([job.task])
+        raise
+    finally:
+        job.waiters -= 1
@@ -0,0 +1,225 @@
+"""Run CFR and FernFlower side by side on the same remapped jar and find the classes where they disagree.
+
+Both outputs land in ``./compare/<version>/<side>/<decompiler>``, every class gets a similarity score computed
+on normalized tokens and their local order (comments, formatting and synthetic local names do not count) and a
+status per decompiler.
+The results can be turned into a preference list routing each class to the decompiler that handles it,
+falling back to the fastest one, which :func:`decompiler.aio.decompile` accepts as ``preferences``.
+Run it with ``python -m decompiler.compare <version>``.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import shutil
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator
+
+from decompiler import CLIENT, MANIFEST_LOCATION, SERVER, Decompiler, Side
+from decompiler.aio import NAMES, prepare, remap, resolve_version, run_decompiler
+from decompiler.diff import walk_pairs
+from decompiler.errors import DecompilerError
+
+COMPARE_DIR = "./compare"
+PREFERENCES_FILE = "./decompiler_preferences.json"
+AGREEMENT_THRESHOLD = 0.8
+
+OK = "ok"
+FAILED = "failed"
+MISSING = "missing"
+
+FAILURE_MARKERS = {
+    Decompiler.CFR: ("This method has failed to decompile", "Exception decompiling", "Unable to fully structure code"),
+    Decompiler.F: ("$FF: Couldn't be decompiled", "$FF: Unable to decompile"),
+}
+
+_COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+_TOKEN = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[A-Za-z_$][\w$]*|\d[\w.]*|\S')
+# local and parameter names are made up by each decompiler (var1 / n2 / string / blockPos), they only add noise:
+# every lowercase identifier that is not a keyword, a member access (after ".") or a call (before "(") is one
+_LOCAL_NAME = re.compile(r"[a-z_$][\w$]*")
+_KEYWORDS = {
+    "abstract", "assert", "boolean", "break", "byte", "case", "catch", "char", "class", "continue", "default", "do",
+    "double", "else", "enum", "extends", "false", "finally", "float", "for", "if", "implements", "import",
+    "instanceof", "int", "interface", "long", "native", "new", "null", "package", "private", "protected", "public",
+    "return", "short", "static", "strictfp", "super", "switch", "synchronized", "throw", "throws", "transient", "true",
+    "try", "var", "void", "volatile", "while", "yield", "record", "sealed", "permits",
+}
+_IGNORED = {"final", "this", ";", "{", "}", "(", ")"}
+
+
+@dataclass(frozen=True)
+class ClassComparison:
+    name: str
+    score: float
+    cfr: str
+    fernflower: str
+
+    @property
+    def agree(self) -> bool:
+        return self.cfr == OK and self.fernflower == OK and self.score >= AGREEMENT_THRESHOLD
+
+
+def normalize_tokens(source: str) -> list[str]:
+    raw = _TOKEN.findall(_COMMENT.sub(" ", source))
+    tokens = []
+    for i, token in enumerate(raw):
+        if token in _IGNORED:
+            continue
+        if (_LOCAL_NAME.fullmatch(token) and token not in _KEYWORDS
+                and (i == 0 or raw[i - 1] != ".") and (i + 1 == len(raw) or raw[i + 1] != "(")):
+            token = "$v"
+        tokens.append(token)
+    return tokens
+
+
+def similarity(a: list[str], b: list[str]) -> float:
+    """
+    1.0 for identical normalized tokens, otherwise the weighted jaccard of both multisets of tokens and pairs of
+    adjacent tokens.
+
+    The pairs make the score order aware while staying linear: reordered statements score below 1.0, though only
+    the pairs around each moved statement change, so a big class with a few moved statements still agrees.
+    """
+    if a == b:
+        return 1.0
+    ca, cb = Counter(a) + Counter(zip(a, a[1:])), Counter(b) + Counter(zip(b, b[1:]))
+    union = sum((ca | cb).values())
+    return sum((ca & cb).values()) / union if union else 1.0
+
+
+def _load(path: Path, decompiler_type: Decompiler):
+    if path is None:
+        return MISSING, []
+    source = path.read_text(encoding="utf-8", errors="replace")
+    status = FAILED if any(marker in source for marker in FAILURE_MARKERS[decompiler_type]) else OK
+    return status, normalize_tokens(source)
+
+
+def iter_comparisons(cfr_dir, fernflower_dir) -> Iterator[ClassComparison]:
+    """Compare both outputs class by class, reading one pair of files at a time"""
+    for name, cfr_path, ff_path in walk_pairs(cfr_dir, fernflower_dir):
+        if not name.endswith(".java"):
+            continue
+        cfr_status, cfr_tokens = _load(cfr_path, Decompiler.CFR)
+        ff_status, ff_tokens = _load(ff_path, Decompiler.F)
+        score = similarity(cfr_tokens, ff_tokens) if cfr_tokens or ff_tokens else 0.0
+        yield ClassComparison(name[:-len(".java")].replace("/", "."), round(score, 4), cfr_status, ff_status)
+
+
+async def run_both(version: str, side: Side = Side.SERVER, manifest_url: str = MANIFEST_LOCATION,
+                   compare_dir: str = COMPARE_DIR) -> dict[Decompiler, tuple[Path, float]]:
+    """Remap ``version`` once and run both decompilers on it in parallel, returns their output dir and duration"""
+    side = Side(side)
+    java, jar, tsrg = await prepare(version, side, manifest_url)
+    root = Path(compare_dir) / version / side.value
+    remapped = root / f"{version}-{side.value}-temp.jar"
+    root.mkdir(parents=True, exist_ok=True)
+
+    async def timed(decompiler_type: Decompiler):
+        out = root / NAMES[decompiler_type]
+        shutil.rmtree(out, ignore_errors=True)
+        out.mkdir()
+        t = time.monotonic()
+        await run_decompiler(java, decompiler_type, remapped, out)
+        return out, time.monotonic() - t
+
+    try:
+        await remap(java, jar, tsrg, remapped)
+        tasks = [asyncio.create_task(timed(Decompiler.CFR)), asyncio.create_task(timed(Decompiler.F))]
+        try:
+            cfr, fernflower = await asyncio.gather(*tasks)
+        except BaseException:
+            # stop the other decompiler before the jar it reads is deleted
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    finally:
+        remapped.unlink(missing_ok=True)
+    return {Decompiler.CFR: cfr, Decompiler.F: fernflower}
+
+
+def build_preferences(comparisons, fastest: Decompiler) -> dict:
+    """
+    Route every class to ``fastest`` unless only the other decompiler produced usable code for it.
+
+    Only the exceptions are listed under ``classes``, ``default`` holds ``fastest``.
+    """
+    fastest = Decompiler(fastest)
+    classes = {}
+    for c in comparisons:
+        status = {Decompiler.CFR: c.cfr, Decompiler.F: c.fernflower}
+        if status[fastest] != OK:
+            other = next((d for d, s in status.items() if d != fastest and s == OK), None)
+            if other is not None:
+                classes[c.name] = other.value
+    return {"default": fastest.value, "classes": classes}
+
+
+def load_preferences(path=PREFERENCES_FILE) -> tuple[Decompiler, dict[str, Decompiler]]:
+    with open(path) as f:
+        data = json.load(f)
+    return Decompiler(data["default"]), {name: Decompiler(d) for name, d in data.get("classes", {}).items()}
+
+
+def save_preferences(preferences: dict, path=PREFERENCES_FILE):
+    with open(path, "w") as f:
+        json.dump(preferences, f, indent=1, sort_keys=True)
+
+
+async def compare(version: str, side: Side = Side.SERVER, manifest_url: str = MANIFEST_LOCATION,
+                  compare_dir: str = COMPARE_DIR, preferences_file: str = None) -> Path:
+    """Run both decompilers, log every class they disagree on and write ``classes.jsonl`` next to the outputs"""
+    version = await resolve_version(version, manifest_url)
+    outputs = await run_both(version, side, manifest_url, compare_dir)
+    for decompiler_type, (_, elapsed) in outputs.items():
+        logging.info(f"{NAMES[decompiler_type]} took {elapsed:.1f}s")
+    fastest = min(outputs, key=lambda d: outputs[d][1])
+
+    report = Path(compare_dir) / version / Side(side).value / "classes.jsonl"
+    total = disagreeing = 0
+    comparisons = []
+    with open(report, "w") as f:
+        for c in iter_comparisons(outputs[Decompiler.CFR][0], outputs[Decompiler.F][0]):
+            total += 1
+            f.write(json.dumps(asdict(c)) + "\n")
+            if not c.agree:
+                disagreeing += 1
+                logging.info(f"{c.name}: score {c.score:.2f}, cfr {c.cfr}, fernflower {c.fernflower}")
+                comparisons.append(c)
+    logging.info(f"{disagreeing}/{total} classes disagree, details in {report}")
+    if preferences_file:
+        preferences = build_preferences(comparisons, fastest)
+        save_preferences(preferences, preferences_file)
+        logging.info(f"Preferences for {len(preferences['classes'])} classes written to {preferences_file}")
+    return report
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s', datefmt='%H:%M:%S')
+
+    parser = argparse.ArgumentParser(description="Find the classes where CFR and FernFlower disagree")
+    parser.add_argument("version", type=str, help="Minecraft Version")
+    parser.add_argument("--side", "-s", dest="side", type=str, default=SERVER, choices=[CLIENT, SERVER],
+                        help="The side you want to decompile (either client or server)")
+    parser.add_argument("--manifest", "-m", dest="manifest", type=str, default=MANIFEST_LOCATION,
+                        help="Version manifest URL")
+    parser.add_argument("--preferences", "-p", dest="preferences", type=str, nargs='?', const=PREFERENCES_FILE,
+                        default=None, help="Write a per class decompiler preference list to this file")
+
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(compare(args.version, args.side, args.manifest, preferences_file=args.preferences))
+    except DecompilerError as e:
+        logging.error(e)
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""Streaming diffs between two decompiled source trees.
+
+Both trees are walked lazily, one directory listing at a time: the files of a directory come first in sorted
+order, then its sub directories, so the files of a package are always yielded together. Memory use is bounded
+by the pair of files whose hunks are being computed. Binary files, such as the assets FernFlower copies out of
+the jar, are reported with :attr:`FileChange.binary` set and never decoded into hunks.
+
+    for change in itertools.islice(iter_changes("1.20.1", "1.20.2"), 100):
+        print(change.status, change.path, change.stats())
+"""
+import codecs
+import difflib
+import os
+import random
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Iterator, Optional
+
+from decompiler import SRC_DIR, Side
+
+ADDED = "added"
+REMOVED = "removed"
+MODIFIED = "modified"
+
+
+def _listing(directory: Optional[Path]) -> tuple[list[str], list[str]]:
+    if directory is None or not directory.is_dir():
+        return [], []
+    files, dirs = [], []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.startswith("."):
+                continue
+            (dirs if entry.is_dir() else files).append(entry.name)
+    return sorted(files), sorted(dirs)
+
+
+def walk_pairs(old_dir, new_dir, _prefix: str = "") -> Iterator[tuple[str, Optional[Path], Optional[Path]]]:
+    """
+    Yield ``(relative path, old file or None, new file or None)`` for every file of either tree.
+
+    Hidden entries such as the ``.decompiler.json`` marker are skipped, decompilers never write them.
+    """
+    old_dir = Path(old_dir) if old_dir is not None else None
+    new_dir = Path(new_dir) if new_dir is not None else None
+    old_files, old_dirs = _listing(old_dir)
+    new_files, new_dirs = _listing(new_dir)
+    old_set, new_set = set(old_files), set(new_files)
+    for name in sorted(old_set | new_set):
+        yield (_prefix + name,
+               old_dir / name if name in old_set else None,
+               new_dir / name if name in new_set else None)
+    old_set, new_set = set(old_dirs), set(new_dirs)
+    for name in sorted(old_set | new_set):
+        yield from walk_pairs(old_dir / name if name in old_set else None,
+                              new_dir / name if name in new_set else None,
+                              f"{_prefix}{name}/")
+
+
+def same_content(old: Path, new: Path, chunk_size: int = 64 * 1024) -> bool:
+    """Byte comparison in chunks, unlike filecmp.cmp nothing is cached between calls"""
+    if old.stat().st_size != new.stat().st_size:
+        return False
+    with open(old, "rb") as a, open(new, "rb") as b:
+        while True:
+            chunk = a.read(chunk_size)
+            if chunk != b.read(chunk_size):
+                return False
+            if not chunk:
+                return True
+
+
+def is_binary(path: Optional[Path], chunk_size: int = 64 * 1024) -> bool:
+    """A NUL byte or anything that is not utf-8 makes a file binary, FernFlower output carries the jar's assets"""
+    if path is None or not path.is_file():
+        return False
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                if b"\0" in chunk:
+                    return True
+                decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+def read_lines(path: Optional[Path]) -> list[str]:
+    if path is None or not path.is_file():
+        return []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.readlines()
+
+
+def hunks(old_lines: list[str], new_lines: list[str], context: int = 3) -> list[dict]:
+    """
+    Group the differences of two line lists into unified-diff style hunks.
+
+    Every hunk is ``{"old_start", "old_count", "new_start", "new_count", "lines"}`` with 1-based starts and
+    ``lines`` prefixed by ``' '``, ``'-'`` or ``'+'`` and stripped of their line ending.
+    """
+    result = []
+    for group in difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_grouped_opcodes(context):
+        lines = []
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                lines.extend(" " + line.rstrip("\r\n") for line in old_lines[i1:i2])
+                continue
+            lines.extend("-" + line.rstrip("\r\n") for line in old_lines[i1:i2])
+            lines.extend("+" + line.rstrip("\r\n") for line in new_lines[j1:j2])
+        old_start, old_end = group[0][1], group[-1][2]
+        new_start, new_end = group[0][3], group[-1][4]
+        result.append({"old_start": old_start + 1 if old_end > old_start else old_start,
+                       "old_count": old_end - old_start,
+                       "new_start": new_start + 1 if new_end > new_start else new_start,
+                       "new_count": new_end - new_start,
+                       "lines": lines})
+    return result
+
+
+@dataclass(frozen=True)
+class FileChange:
+    path: str
+    status: str
+    old: Optional[Path]
+    new: Optional[Path]
+
+    @cached_property
+    def binary(self) -> bool:
+        """Whether either side is binary, binary changes have no hunks"""
+        return is_binary(self.old) or is_binary(self.new)
+
+    def hunks(self, context: int = 3) -> list[dict]:
+        """Read both sides and compute the hunks, nothing but :attr:`binary` is cached on the record"""
+        if self.binary:
+            return []
+        return hunks(read_lines(self.old), read_lines(self.new), context)
+
+    def unified_diff(self) -> Iterator[str]:
+        """The change as unified diff lines, each ending with a line feed"""
+        old_name = f"a/{self.path}" if self.old else "/dev/null"
+        new_name = f"b/{self.path}" if self.new else "/dev/null"
+        if self.binary:
+            yield f"Binary files {old_name} and {new_name} differ\n"
+            return
+        for line in difflib.unified_diff(read_lines(self.old), read_lines(self.new), old_name, new_name):
+            yield line if line.endswith("\n") else line + "\n\\ No newline at end of file\n"
+
+    def stats(self) -> tuple[int, int]:
+        """``(additions, deletions)``, ``(0, 0)`` for :attr:`binary` changes"""
+        file_hunks = self.hunks(0)
+        return (sum(line[0] == "+" for h in file_hunks for line in h["lines"]),
+                sum(line[0] == "-" for h in file_hunks for line in h["lines"]))
+
+
+def walk_changes(old_dir, new_dir) -> Iterator[FileChange]:
+    """Yield a :class:`FileChange` for every added, removed or modified file, unchanged files are skipped"""
+    for path, old, new in walk_pairs(old_dir, new_dir):
+        if old is None:
+            yield FileChange(path, ADDED, None, new)
+        elif new is None:
+            yield FileChange(path, REMOVED, old, None)
+        elif not same_content(old, new):
+            yield FileChange(path, MODIFIED, old, new)
+
+
+def iter_changes(version_a: str, version_b: str, side: Side = Side.SERVER, src_dir: str = SRC_DIR
+                 ) -> Iterator[FileChange]:
+    """Changes from ``src/<version_a>/<side>`` to ``src/<version_b>/<side>``, stop iterating whenever you like"""
+    side = Side(side).value
+    old_dir, new_dir = Path(src_dir) / version_a / side, Path(src_dir) / version_b / side
+    for directory in (old_dir, new_dir):
+        if not directory.is_dir():
+            raise FileNotFoundError(f"{directory} does not exist, decompile it first")
+    return walk_changes(old_dir, new_dir)
+
+
+def write_patch(old_dir, new_dir, out_path) -> int:
+    """Write a unified diff of ``old_dir`` -> ``new_dir`` to ``out_path``, returns the number of changed files"""
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    partial = out_path.with_name(f".{out_path.name}.{random.getrandbits(32):08x}.part")
+    changed = 0
+    try:
+        with open(partial, "w", encoding="utf-8") as out:
+            for change in walk_changes(old_dir, new_dir):
+                changed += 1
+                out.writelines(change.unified_diff())
+        os.replace(partial, out_path)
+    finally:
+        partial.unlink(missing_ok=True)
+    return changed
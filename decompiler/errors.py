@@ -0,0 +1,36 @@
+"""Exceptions raised by the non-interactive parts of the decompiler package."""
+
+
+class DecompilerError(Exception):
+    """Base class of every error raised by the non-interactive API"""
+
+
+class JavaNotFoundError(DecompilerError):
+    """No usable java runtime was found"""
+
+
+class VersionNotFoundError(DecompilerError):
+    """The requested version is not listed in the version manifest"""
+
+
+class DownloadError(DecompilerError):
+    """A manifest, mapping or jar could not be downloaded"""
+
+    def __init__(self, url: str, reason: Exception):
+        super().__init__(f"Could not download {url}: {reason}")
+        self.url = url
+        self.reason = reason
+
+
+class ArtifactError(DecompilerError):
+    """A downloaded or generated file is missing or malformed"""
+
+
+class ProcessError(DecompilerError):
+    """A java subprocess exited with a non-zero status"""
+
+    def __init__(self, args, returncode: int, stderr: str):
+        super().__init__(f"{args[0]} exited with status {returncode}: {stderr.strip()[-2000:]}")
+        self.command = list(args)
+        self.returncode = returncode
+        self.stderr = stderr
@@ -0,0 +1,90 @@
+"""Jar extraction shared by the FernFlower output and the bundled server jars.
+
+Entries are decompressed by several worker threads at once (zlib releases the GIL), each with its own
+handle on the archive, and written with large buffers. Hashes are computed while the bytes are written
+so nothing has to be read back from disk afterwards.
+"""
+import hashlib
+import logging
+import os
+import random
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from decompiler.errors import ArtifactError
+
+BUFFER_SIZE = 1024 * 1024
+
+
+def _target(dest: Path, name: str):
+    parts = PurePosixPath(name.replace("\\", "/")).parts
+    if not parts or parts[0] == "/" or ".." in parts or ":" in parts[0]:
+        logging.warning(f"Skipping unsafe jar entry {name}")
+        return None
+    return dest.joinpath(*parts)
+
+
+def _extract_batch(jar_path: Path, batch: list[tuple[zipfile.ZipInfo, Path]]):
+    with zipfile.ZipFile(jar_path) as z:
+        for info, target in batch:
+            with z.open(info) as src, open(target, "wb") as out:
+                shutil.copyfileobj(src, out, BUFFER_SIZE)
+
+
+def extract_all(jar_path, dest, workers: int = None) -> int:
+    """Extract every file of ``jar_path`` into ``dest`` using ``workers`` threads, returns the number of files"""
+    jar_path, dest = Path(jar_path), Path(dest)
+    with zipfile.ZipFile(jar_path) as z:
+        entries = [(info, _target(dest, info.filename)) for info in z.infolist() if not info.is_dir()]
+    entries = [(info, target) for info, target in entries if target is not None]
+    for directory in {target.parent for _, target in entries}:
+        directory.mkdir(parents=True, exist_ok=True)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(entries)))
+    # largest entries first, each one going to the least loaded batch
+    batches = [[] for _ in range(workers)]
+    loads = [0] * workers
+    for info, target in sorted(entries, key=lambda e: e[0].file_size, reverse=True):
+        i = loads.index(min(loads))
+        batches[i].append((info, target))
+        loads[i] += info.file_size
+    if workers == 1:
+        _extract_batch(jar_path, batches[0])
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(_extract_batch, jar_path, batch) for batch in batches]:
+                future.result()
+    return len(entries)
+
+
+def extract_member(jar_path, member: str, dest, expected_sha256: str = None) -> str:
+    """
+    Extract a single ``member`` of ``jar_path`` to the file ``dest``, hashing it on the way.
+
+    ``dest`` is only replaced once the whole member was written and its sha256 matched ``expected_sha256``,
+    so it may be the archive itself. Returns the sha256 hex digest.
+    """
+    jar_path, dest = Path(jar_path), Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    partial = dest.with_name(f".{dest.name}.{random.getrandbits(32):08x}.part")
+    hash_sha256 = hashlib.sha256()
+    try:
+        with zipfile.ZipFile(jar_path) as z:
+            try:
+                src = z.open(member)
+            except KeyError as e:
+                raise ArtifactError(f"{member} is missing from {jar_path}") from e
+            with src, open(partial, "wb") as out:
+                for chunk in iter(lambda: src.read(BUFFER_SIZE), b""):
+                    hash_sha256.update(chunk)
+                    out.write(chunk)
+        file_hash = hash_sha256.hexdigest()
+        if expected_sha256 is not None and file_hash != expected_sha256:
+            raise ArtifactError(f"Extracted file hash and expected hash did not match up, got {file_hash} "
+                                f"expected {expected_sha256}")
+        os.replace(partial, dest)
+    finally:
+        partial.unlink(missing_ok=True)
+    return file_hash
@@ -0,0 +1,170 @@
+"""Structured change report between two decompiled source trees.
+
+The report directory holds ``index.json`` (totals, per package and per file stats, added / removed / renamed
+classes), one ``shards/<package>.json`` with the hunks of every package and an ``index.html`` viewer that only
+fetches a shard when its package is opened. Binary files (assets in FernFlower output) are flagged with
+``"binary": true`` and have no hunks. Serve the directory over http (``python -m http.server``),
+browsers refuse ``fetch`` on ``file://`` urls.
+"""
+import hashlib
+import json
+import os
+import shutil
+from difflib import SequenceMatcher
+from itertools import groupby
+from pathlib import Path, PurePosixPath
+
+from decompiler.diff import ADDED, MODIFIED, REMOVED, hunks, is_binary, read_lines, walk_changes
+
+REPORT_VERSION = 1
+RENAME_THRESHOLD = 0.6
+VIEWER = Path(__file__).with_name("report_viewer.html")
+
+RENAMED = "renamed"
+
+
+def package_of(path: str) -> str:
+    return ".".join(PurePosixPath(path).parent.parts)
+
+
+def class_of(path: str):
+    """Dotted class name of a .java path, None for anything else"""
+    if not path.endswith(".java"):
+        return None
+    return ".".join(PurePosixPath(path[:-len(".java")]).parts)
+
+
+def shard_name(package: str) -> str:
+    return f"{package or '_default'}.json"
+
+
+def _digest(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha1").hexdigest()
+
+
+def match_renames(old_dir: Path, new_dir: Path, removed: set[str], added: set[str]) -> dict[str, str]:
+    """Pair added files with removed ones, first by identical content then by file name and similarity"""
+    by_hash = {}
+    for name in sorted(removed):
+        by_hash.setdefault(_digest(old_dir / name), []).append(name)
+    renames = {}
+    for name in sorted(added):
+        candidates = by_hash.get(_digest(new_dir / name))
+        if candidates:
+            renames[name] = candidates.pop(0)
+
+    by_file_name = {}
+    for name in sorted(removed - set(renames.values())):
+        by_file_name.setdefault(PurePosixPath(name).name, []).append(name)
+    for name in sorted(added - renames.keys()):
+        candidates = by_file_name.get(PurePosixPath(name).name)
+        if not candidates or len(candidates) != 1:
+            continue
+        # binary files only count as renamed when their content is identical
+        if is_binary(old_dir / candidates[0]) or is_binary(new_dir / name):
+            continue
+        matcher = SequenceMatcher(None, read_lines(old_dir / candidates[0]), read_lines(new_dir / name),
+                                  autojunk=False)
+        if matcher.real_quick_ratio() >= RENAME_THRESHOLD and matcher.ratio() >= RENAME_THRESHOLD:
+            renames[name] = candidates.pop()
+    return renames
+
+
+def _write_json(path: Path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+
+
+def generate_report(old_dir, new_dir, out_dir, old_label: str = None, new_label: str = None) -> dict:
+    """
+    :param old_dir:
+        The older tree, usually ``src/<version>/<side>``
+    :param new_dir:
+        The newer tree
+    :param out_dir:
+        Where index.json, shards/ and index.html are written, existing shards are replaced
+    :param old_label:
+        Name shown for the older tree (defaults to the directory path)
+    :param new_label:
+        Name shown for the newer tree (defaults to the directory path)
+
+    :return:
+        The index that was written to index.json
+    """
+    old_dir, new_dir, out_dir = Path(old_dir), Path(new_dir), Path(out_dir)
+    shards_dir = out_dir / "shards"
+    shutil.rmtree(shards_dir, ignore_errors=True)
+    shards_dir.mkdir(parents=True)
+
+    removed, added = set(), set()
+    for change in walk_changes(old_dir, new_dir):
+        if change.status == ADDED:
+            added.add(change.path)
+        elif change.status == REMOVED:
+            removed.add(change.path)
+    renames = match_renames(old_dir, new_dir, removed, added)
+    renamed_old = set(renames.values())
+
+    totals = {"files": 0, "additions": 0, "deletions": 0, "binary": 0,
+              ADDED: 0, REMOVED: 0, MODIFIED: 0, RENAMED: 0}
+    packages, files = [], []
+    # the walk yields every package in one run, so only one shard is held in memory at a time
+    for package, group in groupby(walk_changes(old_dir, new_dir), key=lambda c: package_of(c.path)):
+        shard = []
+        for change in group:
+            status, old_path = change.status, change.old
+            if change.path in renames:
+                status, old_path = RENAMED, old_dir / renames[change.path]
+            elif status == REMOVED and change.path in renamed_old:
+                continue
+            binary = is_binary(old_path) or is_binary(change.new)
+            file_hunks = [] if binary else hunks(read_lines(old_path), read_lines(change.new))
+            additions = sum(line[0] == "+" for h in file_hunks for line in h["lines"])
+            deletions = sum(line[0] == "-" for h in file_hunks for line in h["lines"])
+            stats = {"path": change.path, "status": status, "additions": additions, "deletions": deletions}
+            if status == RENAMED:
+                stats["old_path"] = renames[change.path]
+            if binary:
+                stats["binary"] = True
+                totals["binary"] += 1
+            files.append(dict(stats, package=package))
+            shard.append(dict(stats, hunks=file_hunks))
+            totals["files"] += 1
+            totals["additions"] += additions
+            totals["deletions"] += deletions
+            totals[status] += 1
+        if shard:
+            _write_json(shards_dir / shard_name(package), {"package": package, "files": shard})
+            packages.append({"name": package, "shard": f"shards/{shard_name(package)}", "files": len(shard),
+                             "additions": sum(f["additions"] for f in shard),
+                             "deletions": sum(f["deletions"] for f in shard)})
+
+    classes = {ADDED: [], REMOVED: [], RENAMED: []}
+    for f in files:
+        if f["status"] == RENAMED and class_of(f["path"]) and class_of(f["old_path"]):
+            classes[RENAMED].append({"old": class_of(f["old_path"]), "new": class_of(f["path"])})
+        elif f["status"] in (ADDED, REMOVED) and class_of(f["path"]):
+            classes[f["status"]].append(class_of(f["path"]))
+
+    index = {"report_version": REPORT_VERSION,
+             "old": old_label or str(old_dir),
+             "new": new_label or str(new_dir),
+             "totals": totals,
+             "packages": packages,
+             "classes": classes,
+             "files": files}
+    _write_json(out_dir / "index.json", index)
+    shutil.copyfile(VIEWER, out_dir / "index.html")
+    return index
+
+
+def generate_side_reports(old_root, new_root, out_dir, old_label: str = None, new_label: str = None) -> list[Path]:
+    """Report every ``<side>`` directory present in both ``src/<version>`` roots into ``out_dir/<side>``"""
+    old_root, new_root, out_dir = Path(old_root), Path(new_root), Path(out_dir)
+    written = []
+    for side in sorted(os.listdir(old_root)):
+        if (old_root / side).is_dir() and (new_root / side).is_dir() and not side.startswith("."):
+            generate_report(old_root / side, new_root / side, out_dir / side, old_label, new_label)
+            written.append(out_dir / side)
+    return written
@@ -0,0 +1,197 @@
+"""Watch the version manifest and pre-decompile new releases and snapshots ahead of demand.
+
+Every new version is pushed through :func:`decompiler.aio.decompile`, then the version it is compared to
+(see :func:`previous_version`) is decompiled as well and the diff between both is written to
+``./diffs/<previous>_<version>/<output directory name>.patch`` (``server-cfr.patch`` for instance), it is
+written again whenever either side was rebuilt. Run it with ``python -m decompiler.watch``.
+"""
+import argparse
+import asyncio
+import http.client
+import logging
+import random
+import urllib.request
+from pathlib import Path
+from urllib.error import HTTPError
+
+from decompiler import CLIENT, MANIFEST_LOCATION, SERVER, Decompiler, Side
+from decompiler.aio import TIMEOUT, decompile, parse_manifest
+from decompiler.compare import PREFERENCES_FILE, load_preferences
+from decompiler.diff import write_patch
+from decompiler.errors import DecompilerError, DownloadError
+
+DIFF_DIR = "./diffs"
+
+
+class ManifestPoller:
+    """Fetch the version manifest with conditional requests, remembering ETag and Last-Modified"""
+
+    def __init__(self, manifest_url: str = MANIFEST_LOCATION):
+        self.manifest_url = manifest_url
+        self.etag = None
+        self.last_modified = None
+        self.manifest = None
+
+    def _fetch(self):
+        request = urllib.request.Request(self.manifest_url)
+        if self.etag:
+            request.add_header("If-None-Match", self.etag)
+        if self.last_modified:
+            request.add_header("If-Modified-Since", self.last_modified)
+        try:
+            with urllib.request.urlopen(request, timeout=TIMEOUT) as f:
+                data = f.read()
+                etag, last_modified = f.headers.get("ETag"), f.headers.get("Last-Modified")
+        except HTTPError as e:
+            if e.code == 304:
+                return None
+            raise DownloadError(self.manifest_url, e) from e
+        except (OSError, http.client.HTTPException) as e:
+            raise DownloadError(self.manifest_url, e) from e
+        manifest = parse_manifest(data, self.manifest_url)
+        self.etag, self.last_modified, self.manifest = etag, last_modified, manifest
+        return manifest
+
+    async def poll(self):
+        """Return the manifest if it changed since the last poll, None otherwise"""
+        return await asyncio.to_thread(self._fetch)
+
+
+def previous_version(manifest: dict, version: str):
+    """
+    The version ``version`` should be diffed against, the manifest is ordered newest first.
+
+    A release is compared to the previous release rather than to the entry right before it, which is usually
+    its own release candidate. Anything else is compared to the entry right before it.
+    """
+    versions = manifest.get("versions", [])
+    index = next((i for i, v in enumerate(versions) if v.get("id") == version), None)
+    if index is None:
+        return None
+    is_release = versions[index].get("type") == "release"
+    for entry in versions[index + 1:]:
+        if not is_release or entry.get("type") == "release":
+            return entry.get("id")
+    return None
+
+
+class Watcher:
+    def __init__(self,
+                 manifest_url: str = MANIFEST_LOCATION,
+                 side: Side = Side.SERVER,
+                 decompiler_type: Decompiler = Decompiler.CFR,
+                 interval: float = 300,
+                 max_interval: float = 3600,
+                 diff_dir: str = DIFF_DIR,
+                 preferences: dict[str, Decompiler] = None):
+        self.poller = ManifestPoller(manifest_url)
+        self.side = Side(side)
+        self.decompiler_type = Decompiler(decompiler_type)
+        self.interval = interval
+        self.max_interval = max_interval
+        self.diff_dir = Path(diff_dir)
+        self.preferences = preferences
+        self.queue: asyncio.Queue[str] = asyncio.Queue()
+        self.done: set[str] = set()
+        self._queued: set[str] = set()
+
+    async def poll_once(self) -> list[str]:
+        """Poll the manifest once and queue latest release / snapshot that are not warm yet"""
+        manifest = await self.poller.poll() or self.poller.manifest
+        queued = []
+        for version in dict.fromkeys((manifest.get("latest") or {}).get(k) for k in ("release", "snapshot")):
+            if version and version not in self.done and version not in self._queued:
+                logging.info(f"Queueing {version}")
+                self._queued.add(version)
+                self.queue.put_nowait(version)
+                queued.append(version)
+        return queued
+
+    async def process(self, version: str):
+        """Decompile ``version`` and its predecessor, then precompute the diff between them"""
+        new = await decompile(version, self.side, self.decompiler_type, manifest_url=self.poller.manifest_url,
+                              preferences=self.preferences)
+        logging.info(f"{version} is warm in {new.path}{' (cached)' if new.cached else ''}")
+        previous = previous_version(self.poller.manifest, version)
+        if previous is None:
+            return None
+        old = await decompile(previous, self.side, self.decompiler_type, manifest_url=self.poller.manifest_url,
+                              preferences=self.preferences)
+        # named after the output directory, so every decompiler and preference set has its own patch
+        patch = self.diff_dir / f"{previous}_{version}" / f"{new.path.name}.patch"
+        if not patch.is_file() or not (old.cached and new.cached):
+            changed = await asyncio.to_thread(write_patch, old.path, new.path, patch)
+            logging.info(f"Diff {previous} -> {version}: {changed} files changed, written to {patch}")
+        return patch
+
+    async def worker(self):
+        while True:
+            version = await self.queue.get()
+            try:
+                await self.process(version)
+                self.done.add(version)
+            except DecompilerError as e:
+                logging.error(f"Failed to pre-decompile {version}, will retry on next poll: {e}")
+            except Exception:
+                logging.exception(f"Unexpected error while pre-decompiling {version}, will retry on next poll")
+            finally:
+                self._queued.discard(version)
+                self.queue.task_done()
+
+    async def run(self):
+        """Poll forever, backing off exponentially while the manifest cannot be fetched"""
+        worker = asyncio.create_task(self.worker())
+        delay = self.interval
+        try:
+            while True:
+                if worker.done():
+                    if not worker.cancelled() and worker.exception() is not None:
+                        logging.error("Worker died, restarting it", exc_info=worker.exception())
+                    worker = asyncio.create_task(self.worker())
+                try:
+                    await self.poll_once()
+                    delay = self.interval
+                except DecompilerError as e:
+                    delay = min(delay * 2, self.max_interval)
+                    logging.warning(f"Polling manifest failed, retrying in {delay:.0f}s: {e}")
+                except Exception:
+                    delay = min(delay * 2, self.max_interval)
+                    logging.exception(f"Unexpected error while polling the manifest, retrying in {delay:.0f}s")
+                await asyncio.sleep(delay * random.uniform(0.9, 1.1))
+        finally:
+            worker.cancel()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s', datefmt='%H:%M:%S')
+
+    parser = argparse.ArgumentParser(description="Pre-decompile new Minecraft versions as soon as they are released")
+    parser.add_argument("--manifest", "-m", dest="manifest", type=str, default=MANIFEST_LOCATION,
+                        help="Version manifest URL")
+    parser.add_argument("--side", "-s", dest="side", type=str, default=SERVER, choices=[CLIENT, SERVER],
+                        help="The side you want to decompile (either client or server)")
+    parser.add_argument("--fern-flower", "-ff", dest="fern_flower", action="store_true", default=False,
+                        help="Use FernFlower Decompiler instead of CFR")
+    parser.add_argument("--interval", "-i", dest="interval", type=float, default=300,
+                        help="Seconds between manifest polls")
+    parser.add_argument("--max-interval", dest="max_interval", type=float, default=3600,
+                        help="Upper bound of the backoff when polling fails")
+    parser.add_argument("--preferences", "-p", dest="preferences", type=str, nargs='?', const=PREFERENCES_FILE,
+                        default=None, help="Route classes to decompilers using a preference list from "
+                                           "python -m decompiler.compare (its default overrides --fern-flower)")
+
+    args = parser.parse_args()
+
+    decompiler_type, preferences = Decompiler.F if args.fern_flower else Decompiler.CFR, None
+    if args.preferences:
+        decompiler_type, preferences = load_preferences(args.preferences)
+    watcher = Watcher(args.manifest, args.side, decompiler_type, args.interval, args.max_interval,
+                      preferences=preferences)
+    try:
+        asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
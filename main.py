@@ -5,6 +5,7 @@ import logging
 from pathlib import Path
 
 from decompiler import download_n_decompile, get_latest_version, Decompiler
+from decompiler.report import generate_side_reports
 
 
 def download_n_decompile_wrapper(version: str,
@@ -32,10 +33,12 @@ def main():
                         help="Skip comparing the decompiled versions")
     parser.add_argument("--fern-flower", "-ff", dest="fern_flower", action="store_true", default=False,
                         help="Use FernFlower Decompiler instead of CFR")
+    parser.add_argument("--report", "-r", dest="report", type=str, default=None,
+                        help="Write a JSON change report with a static HTML viewer to this directory")
 
     args = parser.parse_args()
 
-    if not Path(args.ide_location).exists():
+    if not args.no_compare and not Path(args.ide_location).exists():
         logging.error("IntelliJ IDE not found. Please provide the correct path")
         return
 
@@ -77,6 +80,10 @@ def main():
     logging.info(f"Version 1 Path: {version1_path}")
     logging.info(f"Version 2 Path: {version2_path}")
 
+    if args.report:
+        for report in generate_side_reports(version1_path, version2_path, args.report, args.version[0], args.compare):
+            logging.info(f"Report written to {report}")
+
     if not args.no_compare:
         subprocess.run([args.ide_location, "diff", version1_path, version2_path])
     else:
@@ -0,0 +1,172 @@
+"""Local stand-ins for the Mojang servers and the java toolchain.
+
+``mc_server`` serves a fake version manifest, version jsons, mappings and bundled server jars over http,
+``fake_java`` puts a ``java`` on the PATH that mimics SpecialSource, CFR and FernFlower closely enough for the
+pipeline: sources are the class bytes with a one line header naming the decompiler. Set ``FAKE_JAVA_DELAY`` to
+make every decompiler run take that many seconds and ``FAKE_JAVA_FAIL`` to ``cfr`` or ``fernflower`` to make that
+decompiler fail right away.
+"""
+import hashlib
+import io
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import zipfile
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+FAKE_JAVA = '''#!{python}
+import os, shutil, sys, time, zipfile
+args = sys.argv[1:]
+if args == ["-version"]:
+    sys.exit(0)
+jar = args[args.index("-jar") + 1]
+if os.environ.get("FAKE_JAVA_FAIL") and os.environ["FAKE_JAVA_FAIL"] in jar:
+    sys.exit("failing on purpose")
+if "SpecialSource" not in jar:
+    time.sleep(float(os.environ.get("FAKE_JAVA_DELAY", 0)))
+if "SpecialSource" in jar:
+    shutil.copy(args[args.index("--in-jar") + 1], args[args.index("--out-jar") + 1])
+elif "cfr" in jar:
+    out = args[args.index("--outputdir") + 1]
+    with zipfile.ZipFile(args[args.index("-jar") + 2]) as z:
+        for name in z.namelist():
+            if name.endswith(".class"):
+                path = os.path.join(out, name[:-len(".class")] + ".java")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write("// cfr\\n" + z.read(name).decode())
+    open(os.path.join(out, "summary.txt"), "w").close()
+elif "fernflower" in jar:
+    src, out = args[-2], args[-1]
+    with zipfile.ZipFile(src) as z, zipfile.ZipFile(os.path.join(out, os.path.basename(src)), "w") as o:
+        for name in z.namelist():
+            if name.endswith(".class"):
+                o.writestr(name[:-len(".class")] + ".java", "// fernflower\\n" + z.read(name).decode())
+else:
+    sys.exit(3)
+'''
+
+
+class FakeMojang:
+    def __init__(self, root: Path, url: str):
+        self.root = root
+        self.url = url
+        self.requests = []
+
+    def classes(self, version: str, index: int) -> dict[str, str]:
+        """Every version changes Main, adds one class of its own and keeps Common untouched"""
+        return {
+            "net/minecraft/server/Main.class": f"class Main {{\n  String version = \"{version}\";\n}}\n",
+            "net/minecraft/util/Common.class": "class Common {}\n",
+            f"net/minecraft/world/Thing{index}.class": f"class Thing{index} {{}}\n",
+        }
+
+    def publish(self, versions: list[tuple[str, str]], corrupt: set[str] = ()):
+        """Serve ``(id, type)`` versions, oldest first, ``corrupt`` ids get a server jar that is not a zip"""
+        manifest = {"latest": {}, "versions": []}
+        for index, (version, kind) in enumerate(versions):
+            inner = io.BytesIO()
+            with zipfile.ZipFile(inner, "w") as z:
+                for name, content in self.classes(version, index).items():
+                    z.writestr(name, content)
+            data = inner.getvalue()
+            jar = self.root / f"server-{version}.jar"
+            if version in corrupt:
+                jar.write_bytes(b"not a jar")
+            else:
+                with zipfile.ZipFile(jar, "w") as z:
+                    z.writestr("META-INF/versions.list",
+                               f"{hashlib.sha256(data).hexdigest()}\t{version}\t{version}/server-{version}.jar")
+                    z.writestr(f"META-INF/versions/{version}/server-{version}.jar", data)
+            (self.root / f"mappings-{version}.txt").write_text("# mappings\nnet.minecraft.server.Main -> a:\n")
+            (self.root / f"{version}.json").write_text(json.dumps({"downloads": {
+                "server": {"url": f"{self.url}/server-{version}.jar"},
+                "server_mappings": {"url": f"{self.url}/mappings-{version}.txt"},
+            }}))
+            manifest["versions"].insert(0, {"id": version, "type": kind, "url": f"{self.url}/{version}.json"})
+            if kind == "release":
+                manifest["latest"]["release"] = version
+            # like Mojang's, the latest snapshot is the newest version of any type
+            manifest["latest"]["snapshot"] = version
+        path = self.root / "manifest.json"
+        previous = path.stat().st_mtime if path.exists() else 0
+        path.write_text(json.dumps(manifest))
+        # Last-Modified has a one second resolution, make sure a republished manifest is seen as modified
+        mtime = max(time.time(), previous + 2)
+        os.utime(path, (mtime, mtime))
+
+    @property
+    def manifest_url(self) -> str:
+        return f"{self.url}/manifest.json"
+
+
+@pytest.fixture
+def mc_server(tmp_path):
+    root = tmp_path / "server"
+    root.mkdir()
+    fake = None
+
+    class Handler(SimpleHTTPRequestHandler):
+        def log_request(self, code="-", size="-"):
+            fake.requests.append((self.path, int(code)))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=str(root)))
+    fake = FakeMojang(root, f"http://127.0.0.1:{server.server_address[1]}")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_java(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    java = bin_dir / "java"
+    java.write_text(FAKE_JAVA.format(python=sys.executable))
+    java.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+    return java
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """The pipeline works relative to the current directory (./versions, ./mappings, ./src)"""
+    work = tmp_path / "work"
+    work.mkdir()
+    monkeypatch.chdir(work)
+    return work
+
+
+@pytest.fixture
+def hangup_url():
+    """An http url whose server accepts every connection and closes it without answering"""
+    listener = socket.create_server(("127.0.0.1", 0))
+    listener.settimeout(0.2)
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                connection, _ = listener.accept()
+            except TimeoutError:
+                continue
+            connection.recv(65536)
+            connection.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}/manifest.json"
+    stop.set()
+    thread.join()
+    listener.close()
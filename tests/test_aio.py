@@ -0,0 +1,153 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from decompiler import Decompiler, Side
+from decompiler import aio
+from decompiler.aio import decompile, get_manifest, prepare
+from decompiler.errors import ArtifactError, DownloadError
+
+
+def test_network_errors_are_download_errors(hangup_url):
+    with pytest.raises(DownloadError, match="Could not download"):
+        asyncio.run(get_manifest(hangup_url))
+
+
+def test_stalled_download_times_out(monkeypatch):
+    listener = socket.create_server(("127.0.0.1", 0))
+    monkeypatch.setattr(aio, "TIMEOUT", 0.2)
+    try:
+        with pytest.raises(DownloadError, match="timed out"):
+            asyncio.run(get_manifest(f"http://127.0.0.1:{listener.getsockname()[1]}/manifest.json"))
+    finally:
+        listener.close()
+
+
+def test_manifest_must_be_an_object(mc_server):
+    mc_server.publish([("1.0", "release")])
+    (mc_server.root / "manifest.json").write_text("[]")
+    with pytest.raises(ArtifactError, match="layout of a version manifest"):
+        asyncio.run(get_manifest(mc_server.manifest_url))
+
+
+def test_prepare_unbundles_server_jar(mc_server, fake_java, workdir):
+    mc_server.publish([("1.0", "release")])
+    _, jar, tsrg = asyncio.run(prepare("1.0", Side.SERVER, mc_server.manifest_url))
+    assert jar == workdir / "versions/1.0/server.jar"
+    assert tsrg.is_file()
+    assert sorted(p.name for p in jar.parent.iterdir()) == ["server.jar", "version.json"]
+
+
+def test_corrupt_jar_is_not_cached(mc_server, fake_java, workdir):
+    mc_server.publish([("1.0", "release")], corrupt={"1.0"})
+    with pytest.raises(ArtifactError, match="not a valid jar"):
+        asyncio.run(prepare("1.0", Side.SERVER, mc_server.manifest_url))
+    assert sorted(p.name for p in (workdir / "versions/1.0").iterdir()) == ["version.json"]
+
+    mc_server.publish([("1.0", "release")])
+    _, jar, _ = asyncio.run(prepare("1.0", Side.SERVER, mc_server.manifest_url))
+    assert jar.is_file()
+
+
+def test_bad_version_json_and_mappings_raise_artifact_error(mc_server, fake_java, workdir):
+    mc_server.publish([("1.0", "release"), ("1.1", "release")])
+    (mc_server.root / "1.0.json").write_text("<html>")
+    with pytest.raises(ArtifactError, match="not a valid version json"):
+        asyncio.run(prepare("1.0", Side.SERVER, mc_server.manifest_url))
+    assert not (workdir / "versions/1.0/version.json").exists()
+
+    (mc_server.root / "mappings-1.1.txt").write_text("net.minecraft.server.Main -> a:\n    broken -> b\n")
+    with pytest.raises(ArtifactError, match="could not be converted"):
+        asyncio.run(prepare("1.1", Side.SERVER, mc_server.manifest_url))
+    assert sorted(p.name for p in (workdir / "mappings/1.1").iterdir()) == ["server.txt"]
+
+
+def test_output_is_only_reused_for_the_same_decompiler_and_preferences(mc_server, fake_java, workdir):
+    mc_server.publish([("1.0", "release")])
+    main = "net/minecraft/server/Main.java"
+
+    def run(decompiler_type, preferences=None):
+        return asyncio.run(decompile("1.0", Side.SERVER, decompiler_type, manifest_url=mc_server.manifest_url,
+                                     preferences=preferences))
+
+    cfr = run(Decompiler.CFR)
+    assert not cfr.cached and cfr.path == workdir / "src/1.0/server-cfr"
+    assert run(Decompiler.CFR).cached
+    fernflower = run(Decompiler.F)
+    assert not fernflower.cached and fernflower.path == workdir / "src/1.0/server-fernflower"
+    assert (fernflower.path / main).read_text().startswith("// fernflower")
+    assert (cfr.path / main).read_text().startswith("// cfr")
+
+    preferences = {"net.minecraft.server.Main": Decompiler.CFR}
+    routed = run(Decompiler.F, preferences)
+    assert not routed.cached and routed.path not in (cfr.path, fernflower.path)
+    assert (routed.path / main).read_text().startswith("// cfr")
+    assert (routed.path / "net/minecraft/util/Common.java").read_text().startswith("// fernflower")
+    assert run(Decompiler.F, {"net.minecraft.server.Main": "cfr"}).cached
+    assert run(Decompiler.F).cached
+
+
+def test_output_without_marker_is_rebuilt(mc_server, fake_java, workdir):
+    mc_server.publish([("1.0", "release")])
+    stale = workdir / "src/1.0/server-cfr/Stale.java"
+    stale.parent.mkdir(parents=True)
+    stale.write_text("class Stale {}")
+    result = asyncio.run(decompile("1.0", manifest_url=mc_server.manifest_url))
+    assert not result.cached and not stale.exists()
+
+
+def test_concurrent_calls_share_a_job_and_keep_their_outputs_apart(mc_server, fake_java, workdir):
+    mc_server.publish([("1.0", "release")])
+
+    async def scenario():
+        return await asyncio.gather(*(decompile("1.0", decompiler_type=d, manifest_url=mc_server.manifest_url)
+                                      for d in (Decompiler.F, Decompiler.CFR, Decompiler.F)))
+
+    fernflower, cfr, shared = asyncio.run(scenario())
+    assert shared is fernflower
+    assert not aio._jobs
+    assert not fernflower.cached and not cfr.cached
+    assert (fernflower.path / "net/minecraft/server/Main.java").read_text().startswith("// fernflower")
+    assert (cfr.path / "net/minecraft/server/Main.java").read_text().startswith("// cfr")
+
+
+def test_cancelling_one_waiter_keeps_the_shared_job(mc_server, fake_java, workdir, monkeypatch):
+    mc_server.publish([("1.0", "release")])
+    monkeypatch.setenv("FAKE_JAVA_DELAY", "0.5")
+
+    async def scenario():
+        first = asyncio.create_task(decompile("1.0", manifest_url=mc_server.manifest_url))
+        second = asyncio.create_task(decompile("1.0", manifest_url=mc_server.manifest_url))
+        await asyncio.sleep(0.2)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    result = asyncio.run(scenario())
+    assert not result.cached and (result.path / aio.MARKER).is_file()
+
+
+def test_cancelling_the_last_waiter_stops_the_job(mc_server, fake_java, workdir, monkeypatch):
+    mc_server.publish([("1.0", "release")])
+    monkeypatch.setenv("FAKE_JAVA_DELAY", "30")
+
+    async def scenario():
+        task = asyncio.create_task(decompile("1.0", manifest_url=mc_server.manifest_url))
+        staging = workdir / "src/1.0/.server-cfr-partial"
+        while not staging.is_dir():
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.2)
+        t = time.monotonic()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # the job was cancelled too and killed java instead of waiting for it
+        assert time.monotonic() - t < 5
+        assert not aio._jobs
+
+    asyncio.run(scenario())
+    assert sorted(p.name for p in (workdir / "src").iterdir()) == ["1.0"]
+    assert not any((workdir / "src/1.0").iterdir())
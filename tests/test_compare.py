@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+import pytest
+
+from decompiler import Decompiler
+from decompiler.compare import (AGREEMENT_THRESHOLD, FAILED, MISSING, OK, ClassComparison, build_preferences,
+                                iter_comparisons, load_preferences, normalize_tokens, run_both, save_preferences,
+                                similarity)
+from decompiler.errors import ProcessError
+
+CFR = """/*
+ * Decompiled with CFR 0.152.
+ */
+package net.minecraft.world;
+
+import java.util.ArrayList;
+import java.util.List;
+import java.util.Map;
+import net.minecraft.core.BlockPos;
+
+public class Thing {
+    private final Map<String, Integer> heights;
+
+    public List<String> above(BlockPos blockPos, int n) {
+        ArrayList<String> list = new ArrayList<String>();
+        for (String string : this.heights.keySet()) {
+            int n2 = this.heights.get(string);
+            if (n2 <= blockPos.getY() + n) continue;
+            list.add(string);
+        }
+        return list;
+    }
+}
+"""
+
+FERNFLOWER = """package net.minecraft.world;
+
+import java.util.ArrayList;
+import java.util.List;
+import java.util.Map;
+import net.minecraft.core.BlockPos;
+
+public class Thing {
+   private final Map<String, Integer> heights;
+
+   public List<String> above(BlockPos var1, int var2) {
+      List<String> var3 = new ArrayList();
+
+      for(String var5 : this.heights.keySet()) {
+         int var6 = this.heights.get(var5);
+         if (var6 > var1.getY() + var2) {
+            var3.add(var5);
+         }
+      }
+
+      return var3;
+   }
+}
+"""
+
+
+def test_made_up_names_are_normalized():
+    assert normalize_tokens("String string = list.get(blockPos);") == ["String", "$v", "=", "$v", ".", "get", "$v"]
+    assert normalize_tokens("int var1 = this.count;") == ["int", "$v", "=", ".", "count"]
+
+
+def test_equivalent_outputs_agree():
+    assert similarity(normalize_tokens(CFR), normalize_tokens(FERNFLOWER)) >= AGREEMENT_THRESHOLD
+
+
+
+def test_run_both_stops_the_other_decompiler_on_failure(mc_server, fake_java, workdir, monkeypatch):
+    mc_server.publish([("1.0", "release")])
+    monkeypatch.setenv("FAKE_JAVA_FAIL", "cfr")
+    monkeypatch.setenv("FAKE_JAVA_DELAY", "30")
+
+    async def scenario():
+        with pytest.raises(ProcessError, match="failing on purpose"):
+            await run_both("1.0", manifest_url=mc_server.manifest_url, compare_dir=str(workdir / "compare"))
+        # fernflower was cancelled and killed before run_both gave up, not left running in the background
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    t = time.monotonic()
+    asyncio.run(scenario())
+    assert time.monotonic() - t < 5
+    root = workdir / "compare/1.0/server"
+    assert sorted(p.name for p in root.iterdir()) == ["cfr", "fernflower"]
+    assert not any((root / "fernflower").iterdir())
+
+
+def test_reordered_statements_are_not_identical():
+    source = "void f() {\n  int a = 1;\n  int b = g();\n  h(a, b);\n  k();\n}\n"
+    reordered = "void f() {\n  int b = g();\n  int a = 1;\n  k();\n  h(a, b);\n}\n"
+    assert similarity(normalize_tokens(source), normalize_tokens(reordered)) < 1.0
+
+
+def _tree(root, files):
+    root.mkdir(parents=True)
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return root
+
+
+def test_iter_comparisons_statuses(tmp_path):
+    cfr = _tree(tmp_path / "cfr", {
+        "net/Same.java": CFR,
+        "net/Broken.java": "class Broken {\n    /* This method has failed to decompile */\n}\n",
+        "net/OnlyCfr.java": "class OnlyCfr {}\n",
+        "summary.txt": "not a class",
+    })
+    fernflower = _tree(tmp_path / "fernflower", {
+        "net/Same.java": FERNFLOWER,
+        "net/Broken.java": "class Broken {\n   int works;\n}\n",
+        "net/Failed.java": "class Failed {\n   // $FF: Couldn't be decompiled\n}\n",
+    })
+    comparisons = {c.name: c for c in iter_comparisons(cfr, fernflower)}
+    assert sorted(comparisons) == ["net.Broken", "net.Failed", "net.OnlyCfr", "net.Same"]
+    assert comparisons["net.Same"].agree and comparisons["net.Same"].score >= AGREEMENT_THRESHOLD
+    assert (comparisons["net.Broken"].cfr, comparisons["net.Broken"].fernflower) == (FAILED, OK)
+    assert (comparisons["net.Failed"].cfr, comparisons["net.Failed"].fernflower) == (MISSING, FAILED)
+    assert (comparisons["net.OnlyCfr"].cfr, comparisons["net.OnlyCfr"].fernflower) == (OK, MISSING)
+    assert not any(comparisons[name].agree for name in ("net.Broken", "net.Failed", "net.OnlyCfr"))
+
+
+def test_build_preferences_routes_only_to_working_decompilers(tmp_path):
+    comparisons = [ClassComparison("net.Broken", 0.1, FAILED, OK),
+                   ClassComparison("net.BothFailed", 0.0, FAILED, FAILED),
+                   ClassComparison("net.OnlyFernflower", 0.0, MISSING, OK),
+                   ClassComparison("net.CfrWorks", 0.5, OK, FAILED)]
+    preferences = build_preferences(comparisons, Decompiler.CFR)
+    assert preferences == {"default": "cfr", "classes": {"net.Broken": "f", "net.OnlyFernflower": "f"}}
+    assert build_preferences(comparisons, Decompiler.F)["classes"] == {"net.CfrWorks": "cfr"}
+
+    path = tmp_path / "preferences.json"
+    save_preferences(preferences, path)
+    assert load_preferences(path) == (Decompiler.CFR, {"net.Broken": Decompiler.F,
+                                                       "net.OnlyFernflower": Decompiler.F})
+
+
+def test_run_both(mc_server, fake_java, workdir):
+    mc_server.publish([("1.0", "release")])
+    outputs = asyncio.run(run_both("1.0", manifest_url=mc_server.manifest_url, compare_dir=str(workdir / "compare")))
+    root = workdir / "compare/1.0/server"
+    assert outputs[Decompiler.CFR][0] == root / "cfr" and outputs[Decompiler.F][0] == root / "fernflower"
+    assert all(elapsed >= 0 for _, elapsed in outputs.values())
+    main = "net/minecraft/server/Main.java"
+    assert (root / "cfr" / main).read_text().startswith("// cfr")
+    assert (root / "fernflower" / main).read_text().startswith("// fernflower")
+    # the remapped jar is gone and so is cfr's summary
+    assert sorted(p.name for p in root.iterdir()) == ["cfr", "fernflower"]
+    assert not (root / "cfr/summary.txt").exists()
+    # the fake decompilers copy the class bytes, so both outputs agree
+    assert all(c.agree for c in iter_comparisons(root / "cfr", root / "fernflower"))
@@ -0,0 +1,131 @@
+import itertools
+
+import pytest
+
+from decompiler.diff import (ADDED, MODIFIED, REMOVED, hunks, is_binary, iter_changes, same_content, walk_changes,
+                             walk_pairs, write_patch)
+
+PNG = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR"
+
+
+def test_binary_files_are_not_decoded(tmp_path):
+    old, new = tmp_path / "old", tmp_path / "new"
+    for root, pixel, invalid in ((old, b"\x01", b"\xff\xfe"), (new, b"\x02", b"\xfe\xff")):
+        (root / "assets").mkdir(parents=True)
+        (root / "assets/icon.png").write_bytes(PNG + pixel)
+        # no NUL byte, but not utf-8 either
+        (root / "assets/data.bin").write_bytes(b"header " + invalid)
+
+    changes = list(walk_changes(old, new))
+    assert [(c.path, c.status, c.binary) for c in changes] == [("assets/data.bin", MODIFIED, True),
+                                                                ("assets/icon.png", MODIFIED, True)]
+    assert all(c.hunks() == [] and c.stats() == (0, 0) for c in changes)
+    assert list(changes[1].unified_diff()) == ["Binary files a/assets/icon.png and b/assets/icon.png differ\n"]
+
+    patch = tmp_path / "out.patch"
+    assert write_patch(old, new, patch) == 2
+    assert patch.read_text().splitlines() == ["Binary files a/assets/data.bin and b/assets/data.bin differ",
+                                              "Binary files a/assets/icon.png and b/assets/icon.png differ"]
+
+
+def test_utf8_split_across_chunks_is_text(tmp_path):
+    path = tmp_path / "Text.java"
+    path.write_text("// ü" * 10, encoding="utf-8")
+    assert not is_binary(path, chunk_size=3)
+    assert not is_binary(None)
+
+
+def _tree(root, files):
+    root.mkdir(parents=True)
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return root
+
+
+def test_walk_pairs_lists_files_before_sub_directories_and_skips_hidden_entries(tmp_path):
+    old = _tree(tmp_path / "old", {"b/B.java": "", "a/A.java": "", "Z.java": "", ".decompiler.json": "{}",
+                                   ".hidden/X.java": ""})
+    new = _tree(tmp_path / "new", {"a/A.java": "", "a/c/C.java": "", "M.java": "", "a/.part": ""})
+    assert [(path, a is not None, b is not None) for path, a, b in walk_pairs(old, new)] == [
+        ("M.java", False, True),
+        ("Z.java", True, False),
+        ("a/A.java", True, True),
+        ("a/c/C.java", False, True),
+        ("b/B.java", True, False),
+    ]
+
+
+def test_walk_pairs_is_lazy(tmp_path):
+    old = _tree(tmp_path / "old", {"a/A.java": "", "b/B.java": ""})
+    new = _tree(tmp_path / "new", {"a/A.java": "", "b/B.java": ""})
+    pairs = walk_pairs(old, new)
+    assert next(pairs)[0] == "a/A.java"
+    # b/ has not been listed yet, a file created now still shows up
+    (new / "b/C.java").write_text("")
+    assert [path for path, _, _ in pairs] == ["b/B.java", "b/C.java"]
+
+
+def test_changes_records(tmp_path):
+    _tree(tmp_path / "src/1.0/server", {"net/Same.java": "same\n", "net/Gone.java": "gone\n",
+                                        "net/Main.java": "a\nb\n"})
+    _tree(tmp_path / "src/1.1/server", {"net/Same.java": "same\n", "net/New.java": "new\n",
+                                        "net/Main.java": "a\nc\n"})
+    changes = list(iter_changes("1.0", "1.1", src_dir=str(tmp_path / "src")))
+    assert [(c.path, c.status) for c in changes] == [("net/Gone.java", REMOVED), ("net/Main.java", MODIFIED),
+                                                     ("net/New.java", ADDED)]
+    gone, main, new = changes
+    assert gone.new is None and new.old is None
+    assert (gone.stats(), main.stats(), new.stats()) == ((0, 1), (1, 1), (1, 0))
+    assert list(main.unified_diff()) == ["--- a/net/Main.java\n", "+++ b/net/Main.java\n", "@@ -1,2 +1,2 @@\n",
+                                         " a\n", "-b\n", "+c\n"]
+    assert list(new.unified_diff())[:2] == ["--- /dev/null\n", "+++ b/net/New.java\n"]
+
+
+def test_iter_changes_can_stop_early(tmp_path):
+    _tree(tmp_path / "src/1.0/server", {})
+    _tree(tmp_path / "src/1.1/server", {f"p{i}/C.java": "" for i in range(50)})
+    changes = iter_changes("1.0", "1.1", src_dir=str(tmp_path / "src"))
+    assert [c.path for c in itertools.islice(changes, 3)] == ["p0/C.java", "p1/C.java", "p10/C.java"]
+    changes.close()
+
+
+def test_iter_changes_needs_both_trees(tmp_path):
+    _tree(tmp_path / "src/1.0/server", {"A.java": ""})
+    with pytest.raises(FileNotFoundError, match="decompile it first"):
+        iter_changes("1.0", "1.1", src_dir=str(tmp_path / "src"))
+
+
+def test_same_content_compares_every_chunk(tmp_path):
+    a, b, c = tmp_path / "a", tmp_path / "b", tmp_path / "c"
+    a.write_bytes(b"0123456789")
+    b.write_bytes(b"0123456789")
+    c.write_bytes(b"0123456780")
+    assert same_content(a, b, chunk_size=3)
+    assert not same_content(a, c, chunk_size=3)
+    (tmp_path / "short").write_bytes(b"01")
+    assert not same_content(a, tmp_path / "short", chunk_size=3)
+
+
+def test_hunk_edge_cases():
+    assert hunks([], []) == []
+    assert hunks([], ["a\n", "b\n"]) == [{"old_start": 0, "old_count": 0, "new_start": 1, "new_count": 2,
+                                          "lines": ["+a", "+b"]}]
+    assert hunks(["a\n"], []) == [{"old_start": 1, "old_count": 1, "new_start": 0, "new_count": 0,
+                                   "lines": ["-a"]}]
+    # a missing trailing newline is a change of its own, the line ending is stripped from hunk lines
+    assert hunks(["a\n", "b"], ["a\n", "b\n"]) == [{"old_start": 1, "old_count": 2, "new_start": 1, "new_count": 2,
+                                                    "lines": [" a", "-b", "+b"]}]
+    old = [f"{i}\n" for i in range(20)]
+    new = old[:2] + ["x\n"] + old[3:17] + ["y\n"] + old[18:]
+    assert [(h["old_start"], h["old_count"], h["new_start"], h["new_count"]) for h in hunks(old, new, 1)] == [
+        (2, 3, 2, 3), (17, 3, 17, 3)]
+
+
+def test_no_newline_marker(tmp_path):
+    old = _tree(tmp_path / "old", {"A.java": "a\nb"})
+    new = _tree(tmp_path / "new", {"A.java": "a\nc"})
+    (change,) = walk_changes(old, new)
+    assert "".join(change.unified_diff()).endswith("-b\n\\ No newline at end of file\n"
+                                                   "+c\n\\ No newline at end of file\n")
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import zipfile
+
+import pytest
+
+from decompiler.errors import ArtifactError
+from decompiler.extract import extract_all, extract_member
+
+
+def _jar(path, entries):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in entries.items():
+            z.writestr(name, data)
+    return path
+
+
+def _files(root):
+    return {str(p.relative_to(root)): p.read_bytes() for p in sorted(root.rglob("*")) if p.is_file()}
+
+
+def test_extract_member_checks_the_hash(tmp_path):
+    jar = _jar(tmp_path / "bundle.jar", {"META-INF/versions/1.0/server.jar": b"inner jar"})
+    dest = tmp_path / "out/server.jar"
+    dest.parent.mkdir()
+    dest.write_bytes(b"previous")
+
+    with pytest.raises(ArtifactError, match="did not match"):
+        extract_member(jar, "META-INF/versions/1.0/server.jar", dest, "0" * 64)
+    assert dest.read_bytes() == b"previous"
+    assert os.listdir(dest.parent) == ["server.jar"]
+
+    expected = hashlib.sha256(b"inner jar").hexdigest()
+    assert extract_member(jar, "META-INF/versions/1.0/server.jar", dest, expected) == expected
+    assert dest.read_bytes() == b"inner jar"
+
+
+def test_extract_member_can_replace_the_archive(tmp_path):
+    jar = _jar(tmp_path / "server.jar", {"META-INF/versions/inner.jar": b"inner"})
+    extract_member(jar, "META-INF/versions/inner.jar", jar)
+    assert jar.read_bytes() == b"inner"
+    assert os.listdir(tmp_path) == ["server.jar"]
+
+
+def test_extract_member_reports_missing_members(tmp_path):
+    jar = _jar(tmp_path / "bundle.jar", {"a.txt": b"a"})
+    with pytest.raises(ArtifactError, match="missing.jar is missing"):
+        extract_member(jar, "missing.jar", tmp_path / "out.jar")
+    assert os.listdir(tmp_path) == ["bundle.jar"]
+
+
+def test_extract_all_skips_unsafe_entries(tmp_path):
+    jar = _jar(tmp_path / "evil.jar", {
+        "net/Safe.java": b"safe",
+        "../escape.txt": b"x",
+        "net/../../escape2.txt": b"x",
+        "/absolute.txt": b"x",
+        "C:/drive.txt": b"x",
+        "..\\backslash.txt": b"x",
+    })
+    dest = tmp_path / "out"
+    assert extract_all(jar, dest) == 1
+    assert _files(dest) == {"net/Safe.java": b"safe"}
+    assert sorted(os.listdir(tmp_path)) == ["evil.jar", "out"]
+
+
+@pytest.mark.parametrize("workers", [1, 4, 64])
+def test_extract_all_matches_extractall(tmp_path, workers):
+    entries = {f"pkg{i % 7}/sub{i % 3}/File{i}.java": os.urandom(i * 97) + b"x" * (i * 1000) for i in range(60)}
+    entries["empty.txt"] = b""
+    jar = _jar(tmp_path / "big.jar", entries)
+    with zipfile.ZipFile(jar, "a") as z:
+        z.mkdir("pkg0/empty")
+    expected = tmp_path / "expected"
+    with zipfile.ZipFile(jar) as z:
+        z.extractall(expected)
+
+    assert extract_all(jar, tmp_path / "out", workers=workers) == len(entries)
+    assert _files(tmp_path / "out") == _files(expected)
@@ -0,0 +1,113 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from decompiler.report import generate_report, generate_side_reports, match_renames
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+COMMON = "".join(f"  int field{i};\n" for i in range(20))
+
+
+def _tree(root, files):
+    root.mkdir(parents=True, exist_ok=True)
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, bytes):
+            path.write_bytes(content)
+        else:
+            path.write_text(content)
+    return root
+
+
+def _trees(tmp_path):
+    old = _tree(tmp_path / "old", {
+        "net/a/Main.java": "class Main {\n  int x;\n}\n",
+        "net/a/Moved.java": "class Moved {}\n",
+        "net/a/Similar.java": "class Similar {\n" + COMMON + "}\n",
+        "net/a/Gone.java": "class Gone {}\n",
+        "net/b/Same.java": "class Same {}\n",
+        "assets/icon.png": b"\x89PNG\x00\x01",
+    })
+    new = _tree(tmp_path / "new", {
+        "net/a/Main.java": "class Main {\n  int y;\n}\n",
+        "net/c/Moved.java": "class Moved {}\n",
+        "net/c/Similar.java": "class Similar {\n" + COMMON + "  int extra;\n}\n",
+        "net/b/Same.java": "class Same {}\n",
+        "net/b/Added.java": "class Added {}\n",
+        "assets/icon.png": b"\x89PNG\x00\x02",
+    })
+    return old, new
+
+
+def test_match_renames(tmp_path):
+    old, new = _trees(tmp_path)
+    _tree(old, {"net/x/Dup.java": "class Dup {}\n", "net/y/Dup.java": "class Dup {}\n"})
+    _tree(new, {"net/z/Dup.java": "class Dup {\n  int changed;\n}\n", "net/z/Other.java": "class Unrelated {}\n"})
+    renames = match_renames(old, new,
+                            {"net/a/Moved.java", "net/a/Similar.java", "net/a/Gone.java", "net/x/Dup.java",
+                             "net/y/Dup.java"},
+                            {"net/c/Moved.java", "net/c/Similar.java", "net/b/Added.java", "net/z/Dup.java",
+                             "net/z/Other.java"})
+    # identical content first, then a unique file name with similar content, ambiguous names are left alone
+    assert renames == {"net/c/Moved.java": "net/a/Moved.java", "net/c/Similar.java": "net/a/Similar.java"}
+
+
+def test_report_index_and_shards(tmp_path):
+    old, new = _trees(tmp_path)
+    out = tmp_path / "report"
+    index = generate_report(old, new, out, "1.0", "1.1")
+    assert json.loads((out / "index.json").read_text()) == index
+    assert (out / "index.html").is_file()
+    assert (index["old"], index["new"]) == ("1.0", "1.1")
+    assert index["totals"] == {"files": 6, "additions": 3, "deletions": 2, "binary": 1,
+                               "added": 1, "removed": 1, "modified": 2, "renamed": 2}
+    assert index["classes"] == {"added": ["net.b.Added"], "removed": ["net.a.Gone"],
+                                "renamed": [{"old": "net.a.Moved", "new": "net.c.Moved"},
+                                            {"old": "net.a.Similar", "new": "net.c.Similar"}]}
+    assert [(p["name"], p["shard"], p["files"]) for p in index["packages"]] == [
+        ("assets", "shards/assets.json", 1), ("net.a", "shards/net.a.json", 2),
+        ("net.b", "shards/net.b.json", 1), ("net.c", "shards/net.c.json", 2)]
+
+    shard = json.loads((out / "shards/net.a.json").read_text())
+    assert shard["package"] == "net.a"
+    assert [(f["path"], f["status"], f["additions"], f["deletions"]) for f in shard["files"]] == [
+        ("net/a/Gone.java", "removed", 0, 1), ("net/a/Main.java", "modified", 1, 1)]
+    assert shard["files"][1]["hunks"][0]["lines"] == [" class Main {", "-  int x;", "+  int y;", " }"]
+
+    renamed = json.loads((out / "shards/net.c.json").read_text())["files"]
+    assert [(f["path"], f["old_path"], f["additions"]) for f in renamed] == [
+        ("net/c/Moved.java", "net/a/Moved.java", 0), ("net/c/Similar.java", "net/a/Similar.java", 1)]
+
+    (asset,) = json.loads((out / "shards/assets.json").read_text())["files"]
+    assert asset == {"path": "assets/icon.png", "status": "modified", "additions": 0, "deletions": 0,
+                     "binary": True, "hunks": []}
+    assert {"path": "assets/icon.png", "status": "modified", "additions": 0, "deletions": 0, "binary": True,
+            "package": "assets"} in index["files"]
+
+
+def test_report_replaces_stale_shards(tmp_path):
+    old, new = _trees(tmp_path)
+    stale = tmp_path / "report/shards/net.gone.json"
+    stale.parent.mkdir(parents=True)
+    stale.write_text("{}")
+    generate_report(old, new, tmp_path / "report")
+    assert not stale.exists()
+
+
+def test_side_reports_skip_hidden_and_one_sided_directories(tmp_path):
+    for version, change in (("1.0", "a"), ("1.1", "b")):
+        for side in ("server", "client", ".server-partial"):
+            _tree(tmp_path / "src" / version / side, {"A.java": change})
+    _tree(tmp_path / "src/1.1/server-cfr", {"A.java": "only in 1.1"})
+    (tmp_path / "src/1.0/notes.txt").write_text("not a side")
+    written = generate_side_reports(tmp_path / "src/1.0", tmp_path / "src/1.1", tmp_path / "report")
+    assert written == [tmp_path / "report/client", tmp_path / "report/server"]
+    assert sorted(p.name for p in (tmp_path / "report").iterdir()) == ["client", "server"]
+
+
+def test_report_flag_needs_a_directory():
+    result = subprocess.run([sys.executable, str(MAIN), "-r"], capture_output=True, text=True)
+    assert result.returncode == 2
+    assert "--report/-r: expected one argument" in result.stderr
@@ -0,0 +1,153 @@
+import asyncio
+import random
+import shutil
+
+import pytest
+
+from decompiler import Decompiler, watch
+from decompiler.errors import DownloadError
+from decompiler.watch import ManifestPoller, Watcher, previous_version
+
+
+def test_previous_version_skips_release_candidates():
+    manifest = {"versions": [
+        {"id": "1.21", "type": "release"},
+        {"id": "1.21-rc1", "type": "snapshot"},
+        {"id": "1.21-pre1", "type": "snapshot"},
+        {"id": "1.20.6", "type": "release"},
+    ]}
+    assert previous_version(manifest, "1.21") == "1.20.6"
+    assert previous_version(manifest, "1.21-rc1") == "1.21-pre1"
+    assert previous_version(manifest, "1.20.6") is None
+    assert previous_version(manifest, "unknown") is None
+
+
+def test_poller_sends_conditional_requests(mc_server):
+    mc_server.publish([("1.0", "release")])
+    poller = ManifestPoller(mc_server.manifest_url)
+
+    first = asyncio.run(poller.poll())
+    assert first["latest"]["release"] == "1.0"
+    assert asyncio.run(poller.poll()) is None
+    assert poller.manifest == first
+    assert mc_server.requests == [("/manifest.json", 200), ("/manifest.json", 304)]
+
+    mc_server.publish([("1.0", "release"), ("1.1-pre1", "snapshot")])
+    assert asyncio.run(poller.poll())["latest"]["snapshot"] == "1.1-pre1"
+
+
+def _backoff_delays(manifest_url, monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(round(delay))
+        if len(delays) == 5:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(random, "uniform", lambda a, b: 1)
+    monkeypatch.setattr(watch.asyncio, "sleep", fake_sleep)
+    watcher = Watcher(manifest_url, interval=1, max_interval=8)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(watcher.run())
+    return delays
+
+
+def test_backoff_while_manifest_is_unreachable(monkeypatch):
+    assert _backoff_delays("http://127.0.0.1:9/manifest.json", monkeypatch) == [2, 4, 8, 8, 8]
+
+
+def test_backoff_when_the_connection_drops(hangup_url, monkeypatch):
+    assert _backoff_delays(hangup_url, monkeypatch) == [2, 4, 8, 8, 8]
+
+
+def test_backoff_on_a_manifest_that_is_not_an_object(mc_server, monkeypatch):
+    mc_server.publish([("1.0", "release")])
+    (mc_server.root / "manifest.json").write_text('["1.0"]')
+    assert _backoff_delays(mc_server.manifest_url, monkeypatch) == [2, 4, 8, 8, 8]
+
+
+def test_poller_maps_dropped_connections_to_download_errors(hangup_url):
+    with pytest.raises(DownloadError):
+        asyncio.run(ManifestPoller(hangup_url).poll())
+
+
+def test_queues_new_versions_and_precomputes_diff(mc_server, fake_java, workdir):
+    async def scenario():
+        watcher = Watcher(mc_server.manifest_url, interval=1)
+        worker = asyncio.create_task(watcher.worker())
+        try:
+            mc_server.publish([("1.0", "release"), ("1.1-pre1", "snapshot")])
+            assert await watcher.poll_once() == ["1.0", "1.1-pre1"]
+            await watcher.queue.join()
+            assert await watcher.poll_once() == []
+
+            mc_server.publish([("1.0", "release"), ("1.1-pre1", "snapshot"), ("1.1", "release")])
+            assert await watcher.poll_once() == ["1.1"]
+            await watcher.queue.join()
+            return watcher
+        finally:
+            worker.cancel()
+
+    watcher = asyncio.run(scenario())
+    assert watcher.done == {"1.0", "1.1-pre1", "1.1"}
+    assert (workdir / "src/1.1/server-cfr/net/minecraft/server/Main.java").read_text().startswith("// cfr")
+
+    snapshot_patch = (workdir / "diffs/1.0_1.1-pre1/server-cfr.patch").read_text()
+    assert '-  String version = "1.0";' in snapshot_patch
+    assert '+  String version = "1.1-pre1";' in snapshot_patch
+    # the release is diffed against the previous release, not against its own pre-release
+    assert not (workdir / "diffs/1.1-pre1_1.1").exists()
+    release_patch = (workdir / "diffs/1.0_1.1/server-cfr.patch").read_text()
+    assert "b/net/minecraft/world/Thing2.java" in release_patch
+    assert "a/net/minecraft/world/Thing0.java" in release_patch
+    assert "Common.java" not in release_patch
+
+
+def test_worker_survives_unexpected_errors(mc_server, fake_java, workdir, monkeypatch):
+    mc_server.publish([("1.0", "release")])
+    real_decompile = watch.decompile
+    calls = []
+
+    async def flaky(version, *args, **kwargs):
+        calls.append(version)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return await real_decompile(version, *args, **kwargs)
+
+    monkeypatch.setattr(watch, "decompile", flaky)
+
+    async def scenario():
+        watcher = Watcher(mc_server.manifest_url)
+        worker = asyncio.create_task(watcher.worker())
+        try:
+            await watcher.poll_once()
+            await watcher.queue.join()
+            assert watcher.done == set() and not worker.done()
+            await watcher.poll_once()
+            await watcher.queue.join()
+            return watcher
+        finally:
+            worker.cancel()
+
+    assert asyncio.run(scenario()).done == {"1.0"}
+
+
+def test_patch_follows_decompiler_and_rebuilds(mc_server, fake_java, workdir):
+    mc_server.publish([("1.0", "release"), ("1.1", "release")])
+
+    def process(decompiler_type):
+        watcher = Watcher(mc_server.manifest_url, decompiler_type=decompiler_type)
+        asyncio.run(watcher.poller.poll())
+        return asyncio.run(watcher.process("1.1"))
+
+    cfr = process(Decompiler.CFR)
+    fernflower = process(Decompiler.F)
+    assert (cfr.name, fernflower.name) == ("server-cfr.patch", "server-fernflower.patch")
+    assert "+// fernflower" not in cfr.read_text() and "// fernflower" in fernflower.read_text()
+
+    # a rebuilt side invalidates the patch even though its file exists
+    cfr.write_text("stale")
+    shutil.rmtree(workdir / "src/1.0/server-cfr")
+    assert process(Decompiler.CFR).read_text() != "stale"
+    cfr.write_text("kept")
+    assert process(Decompiler.CFR).read_text() == "kept"